@@ -0,0 +1,37 @@
+import os
+from functools import lru_cache
+
+from PIL import Image, ImageFont
+
+# Assets live next to the code so rendering works from any working directory
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_PATH = os.path.join(ASSET_DIR, "infographic_template.png")
+
+
+@lru_cache(maxsize=None)
+def load_template(template_path = TEMPLATE_PATH):
+    """
+    Decodes the infographic template once and keeps it in memory. Never draw on the result directly, use new_canvas().
+    @param template_path: The path for the template image, defaults to infographic_template.png.
+    """
+    template = Image.open(template_path)
+    template.load()
+    return template
+
+
+def new_canvas(template_path = TEMPLATE_PATH):
+    """
+    Returns a fresh copy of the decoded template to draw on.
+    @param template_path: The path for the template image, defaults to infographic_template.png.
+    """
+    return load_template(template_path).copy()
+
+
+@lru_cache(maxsize=None)
+def get_font(font_name = "Roboto-Regular.ttf", font_size = 25):
+    """
+    Loads a TrueType font once per name and size, relative font names are looked up next to the code.
+    @param font_name: The font file, defaults to Roboto-Regular.ttf.
+    @param font_size: The font size, defaults to 25.
+    """
+    return ImageFont.truetype(os.path.join(ASSET_DIR, font_name), font_size)
@@ -0,0 +1,38 @@
+import time
+
+from screenshot_processing import find_rectangles, find_rectangles_in_bytes
+
+
+def analyze_screenshot(image_path):
+    """
+    Runs find_rectangles on a single image, catching any failure so one bad screenshot can't abort a batch.
+    Returns a tuple of (image_path, json_object, error), where exactly one of json_object and error is None.
+    @param image_path: The path for the image to analyze.
+    """
+    try:
+        return image_path, find_rectangles(image_path), None
+    except Exception as e:
+        return image_path, None, "{}: {}".format(type(e).__name__, e)
+
+
+def analyze_screenshot_bytes(image_path, image_bytes):
+    """
+    Same as analyze_screenshot for a screenshot already read into memory, e.g. a member of a zip or tar archive.
+    @param image_path: The name reported with the result, the date is read from it.
+    @param image_bytes: The encoded image as bytes.
+    """
+    try:
+        return image_path, find_rectangles_in_bytes(image_bytes, image_path), None
+    except Exception as e:
+        return image_path, None, "{}: {}".format(type(e).__name__, e)
+
+
+def timed_analysis(analyze, *args):
+    """
+    Runs analyze_screenshot or analyze_screenshot_bytes and also returns how long it took, as (image_path, json_object, error, seconds).
+    @param analyze: The analysis function.
+    @param args: Its arguments.
+    """
+    start = time.perf_counter()
+    image_path, data, error = analyze(*args)
+    return image_path, data, error, time.perf_counter() - start
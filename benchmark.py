@@ -0,0 +1,146 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from calendar_draw import draw_calendar
+from game_store import GameStore
+from generate import cached_results, create_infographic
+from screenshot_processing import find_rectangles, color_categorizer, classify_colors
+from stats_draw import draw_infographics
+from synthetic import NYT_COLORS, generate_games, write_screenshots
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+
+def measure(function, memory = True):
+    """
+    Runs a function and returns (seconds, peak_bytes, result).
+    Timing comes from an untraced run, peak memory from a second run under tracemalloc since tracing slows Python code down.
+    @param function: A function taking no arguments.
+    @param memory: True or False, toggles the second run for peak memory. Peak is None when off.
+    """
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return seconds, peak, result
+
+
+def tile_colors(games, rng, noise = 3):
+    """
+    Returns the RGB tile colors of every guess in the games, with a little noise like real screenshots, and their true names.
+    """
+    names = [color for rows, _ in games for row in rows for color in row]
+    colors = np.array([NYT_COLORS[name] for name in names]) + rng.integers(-noise, noise + 1, (len(names), 3))
+    return colors, [name.lower() for name in names]
+
+
+def benchmark_size(size, folder_path, max_images = None, workers = 1, memory = True):
+    """
+    Runs every stage for one history length and returns a list of result rows.
+    @param size: Number of games in the synthetic history.
+    @param folder_path: Folder the synthetic screenshots are written to.
+    @param max_images: Caps the number of screenshots written for the image stages, defaults to None (one per game).
+    @param workers: Worker processes for the end-to-end create_infographic run.
+    @param memory: True or False, toggles peak memory measurement.
+    """
+    rng = np.random.default_rng(size)
+    games = generate_games(size, seed=size)
+    truths = [truth for _, truth in games]
+    rows = []
+
+    def row(stage, items, seconds, peak, accuracy = None):
+        rows.append({
+            "games": size, "stage": stage, "items": items, "seconds": round(seconds, 4),
+            "per_second": round(items / seconds, 1) if seconds else None,
+            "peak_mb": round(peak / 2**20, 2) if peak is not None else None,
+            "accuracy": round(accuracy, 4) if accuracy is not None else None,
+        })
+
+    # Color classification, every tile of every game
+    colors, names = tile_colors(games, rng)
+    seconds, peak, found = measure(lambda: [color_categorizer(tuple(color)) for color in colors.tolist()], memory)
+    row("color_categorizer", len(names), seconds, peak, np.mean([a == b for a, b in zip(found, names)]))
+    seconds, peak, found = measure(lambda: classify_colors(colors), memory)
+    row("classify_colors", len(names), seconds, peak, np.mean([a == b for a, b in zip(found, names)]))
+
+    # Rendering from already analyzed data
+    store = GameStore.from_results(truths)
+    seconds, peak, _ = measure(lambda: draw_calendar(store), memory)
+    row("draw_calendar", size, seconds, peak)
+    seconds, peak, _ = measure(lambda: draw_infographics(store), memory)
+    row("draw_infographics", size, seconds, peak)
+
+    # Screenshot analysis and the whole pipeline, on real image files
+    image_games = games[:max_images] if max_images else games
+    written = write_screenshots(folder_path, image_games, seed=size)
+    seconds, peak, results = measure(lambda: [find_rectangles(image_path) for image_path, _ in written], memory)
+    row("find_rectangles", len(written), seconds, peak, np.mean([result == truth for result, (_, truth) in zip(results, written)]))
+
+    output = os.path.join(folder_path, os.pardir, "infographic_{}.png".format(size))
+    # Every run writes a fresh result cache, so no run hits the previous one and the first run's results can be read back afterwards
+    cache_paths = []
+
+    def pipeline():
+        cache_paths.append(os.path.join(folder_path, os.pardir, "cache_{}_{}.json".format(size, len(cache_paths))))
+        return create_infographic(folder_path, cache_path=cache_paths[-1], workers=workers, output=output, show=False, hash_index_path=None)
+
+    seconds, peak, _ = measure(pipeline, memory)
+    # Share of games the pipeline drew exactly as generated, matched by date (every synthetic game has its own date)
+    drawn = {game['Date']: game for game in cached_results(folder_path, cache_paths[0], hash_index_path=None)[0]}
+    row("create_infographic", len(written), seconds, peak, np.mean([drawn.get(truth['Date']) == truth for _, truth in written]))
+
+    return rows
+
+
+def run_benchmarks(sizes = DEFAULT_SIZES, max_images = None, workers = 1, memory = True):
+    """
+    Benchmarks every stage at each history length on synthetic data and returns all result rows.
+    @param sizes: A list of history lengths in games, defaults to 1k, 10k and 100k.
+    @param max_images: Caps the number of screenshots written for the image stages, defaults to None (one per game).
+    @param workers: Worker processes for the end-to-end create_infographic run, defaults to 1.
+    @param memory: True or False, toggles peak memory measurement.
+    """
+    rows = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            rows.extend(benchmark_size(size, os.path.join(temp_dir, "screenshots"), max_images, workers, memory))
+    return rows
+
+
+def print_rows(rows):
+    print("{:>8} {:<20} {:>8} {:>10} {:>12} {:>9} {:>9}".format("games", "stage", "items", "seconds", "items/s", "peak MB", "accuracy"))
+    for row in rows:
+        print("{games:>8} {stage:<20} {items:>8} {seconds:>10} {per_second!s:>12} {peak_mb!s:>9} {accuracy!s:>9}".format(**row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the NYT Connections pipeline on synthetic screenshots.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="Comma separated history lengths in games.")
+    parser.add_argument("--max-images", type=int, default=None, help="Cap on screenshots written per size for the image stages.")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for create_infographic.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the traced second run used for peak memory.")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    rows = run_benchmarks([int(size) for size in args.sizes.split(",")], args.max_images, args.workers, not args.no_memory)
+    print_rows(rows)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
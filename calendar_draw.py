@@ -1,107 +1,133 @@
-from PIL import Image, ImageDraw
-from datetime import datetime, timedelta
-
-
-def draw_calendar(dict):
-    # Open the template image for processing
-    image = Image.open("infographic_template.png")
+from PIL import ImageDraw
+from assets import new_canvas, get_font, load_template
+from datetime import date, datetime, timedelta
+from calendar_layout import CalendarLayout
+from game_data import iter_games
+
+# infographic_template.png has the year title and January-December labels baked in
+TEMPLATE_YEAR = 2024
+TEXT_COLOR = (203, 203, 203)
+BACKGROUND_COLOR = (0, 0, 0)
+# Area covered by the year title, and the top edge of its text
+TITLE_BOX = (0, 0, 1000, 200)
+TITLE_TOP = 18
+TITLE_FONT_SIZE = 200
+# Space kept free on both sides of a title
+TITLE_MARGIN = 20
+# Month labels sit above each month's first cell
+LABEL_OFFSET_X = -12
+LABEL_OFFSET_Y = -71
+LABEL_BOX = (-12, -75, 238, -45)
+LABEL_FONT_SIZE = 24
+# Every day is drawn as a 21x21 square around its cell center
+SQUARE_LENGTH = 21
+SQUARE_OFFSET = (SQUARE_LENGTH - 1)/2
+
+
+def draw_calendar(dict, image = None, layout = None):
+    """
+    Draws a square for every game onto the calendar and returns the image.
+    Each square is placed straight from its date, so drawing costs O(games) however long the history is.
+    @param dict: A GameStore, or a dictionary of NYT Connections data grouped by month.
+    @param image: The PIL image to draw on, defaults to a fresh copy of the template.
+    @param layout: The CalendarLayout to draw, defaults to the calendar year of the most recent game.
+    """
+    # Start from the cached template unless the caller is already building an image
+    if image is None:
+        image = new_canvas()
     draw = ImageDraw.Draw(image)
 
-    # Set the fill value for transparent rectangles (skipped days)
-    transparent_value = (0, 255, 0, 0)
-
-    ### Image Setup ###
-    # Set the starting location (1/1/2024)
-    x = 19; y = 310
-    # Set drawing constants
-    square_length = 21
-    square_offset = (square_length - 1)/2
-    # Starting on Sunday in January, which isn't the first so just manually offset
-    days_to_skip = 1
-    # Padding between days in the same month (e.g. 1/2/24 - 1/1/24 x value)
-    day_padding = 32
-    # Padding between rows in the same month (e.g. 1/8/24 - 1/1/24 y value)
-    week_padding = 30
-    # Padding between months in the same row (e.g. 2/1/24 - 1/1/24 x value)
-    month_padding = 258
-    # Padding between months in different rows (e.g. 5/1/24 - 1/1/24 y value)
-    row_height = 275
-    # Set the initial days to skip for the current year (week starts on Sundays)
-    initial_days_skipped = 1
-
-    # Get all dates in current year to validate data
-    expected_dates = get_expected_dates()
-
-    # Loop through monthly data and set iterator
-    i = 0
-    x_space = 0
-    for month, data_dict in dict.items():
-        # Set the initial space in row/column for x,y
-        y_space = 0
-
-        # Check if new row is needed
-        if month%5 == 0:
-            # Reset x
-            x = 19 
-            # Update y
-            y = 310 + ((month/5)*row_height)
-
-        # Check if any days need to be skipped and move x cursor accordingly
-        while initial_days_skipped > 0:
-            x_space += 1
-            initial_days_skipped -= 1
-
-        # Next, loop daily result per month
-        for index, data in data_dict.items():
-            if str(data['Date']) == expected_dates[i]:
-
-                # Check if we need a new row in current month
-                if x_space%7 == 0 and x != 0:
-                    y_space += 1
-                    x_space = 0
-
-                # Update x,y cursors in new variables
-                xcurrent = x + (x_space * day_padding)
-                ycurrent = y + (y_space * week_padding)
-
-                # Get coordinates for bounds of square
-                left, top, right, bottom = get_bounds(xcurrent, ycurrent, square_offset)
-
-                # Draw the square using the value assigned for the guess count
-                draw.rectangle([left, top, right, bottom], fill = guess_color(data['Result'], data['Guesses']))
-
-                # Increment
-                i += 1
-                x_space += 1
-            else:
-                try:
-                    # Check if the date exists at all first
-                    index_value = expected_dates.index(str(data['Date']))
-
-                    # Increment by the difference between the matching index and current iterated index
-                    x_space += (index_value-i)
-                    i = index_value
-
-                    # Get coordinates for rectangle - could move this into a sub-function for better code clarity
-                    xcurrent = x + (x_space * day_padding)
-                    ycurrent = y + (y_space * week_padding)
-                    left, top, right, bottom = get_bounds(xcurrent, ycurrent, square_offset)
-                    draw.rectangle([left, top, right, bottom], fill = guess_color(data['Result'], data['Guesses']))
-
-                    # Final increment for next cycle
-                    i += 1
-                    x_space += 1
-
-                except ValueError:
-                    print("Date error on index: ", i, "and date: ", str(data['Date']))
-                    # Should I add something here to change the increment? Test later
-
-        # Adjust x for the next column/month
-        x = x + month_padding
-        # Reset y_space
-        y_space = 0
-    
-    image.save("infographic.png")
+    games = []
+    for data in iter_games(dict):
+        try:
+            games.append((date.fromisoformat(str(data['Date'])), data))
+        except ValueError:
+            print("Date error on date: ", str(data['Date']))
+
+    # Default to the year of the latest game, or the current year with no games
+    if layout is None:
+        layout = CalendarLayout.for_year(max(day for day, _ in games).year if games else datetime.now().year)
+
+    draw_panel_labels(draw, layout)
+
+    for day, data in games:
+        draw_day(draw, layout, day, data)
+
+    return image
+
+
+def draw_day(draw, layout, day, data):
+    """
+    Draws the square for a single game, games outside the panel belong to another year or window and are skipped.
+    @param draw: An ImageDraw for the image.
+    @param layout: The CalendarLayout being drawn.
+    @param day: The date of the game.
+    @param data: A json object in the format returned by find_rectangles.
+    """
+    center = layout.cell_center(day)
+    if center is None:
+        return
+
+    # Draw the square using the value assigned for the guess count
+    left, top, right, bottom = get_bounds(center[0], center[1], SQUARE_OFFSET)
+    draw.rectangle([left, top, right, bottom], fill = guess_color(data['Result'], data['Guesses']))
+
+
+def clear_day(image, layout, day):
+    """
+    Restores the template background under a single day's square, e.g. when its screenshot was removed.
+    @param image: The PIL image to clear the square on.
+    @param layout: The CalendarLayout being drawn.
+    @param day: The date to clear.
+    """
+    center = layout.cell_center(day)
+    if center is None:
+        return
+
+    left, top, right, bottom = get_bounds(center[0], center[1], SQUARE_OFFSET)
+    box = (int(left), int(top), int(right) + 1, int(bottom) + 1)
+    image.paste(load_template().crop(box), box)
+
+
+def draw_panel_labels(draw, layout, title = None):
+    """
+    Redraws the year title and month labels when the panel isn't the one baked into the template.
+    @param draw: An ImageDraw for the image.
+    @param layout: The CalendarLayout being drawn.
+    @param title: An optional title replacing the year, e.g. "Q1 2024", shrunk to fit the title area.
+    """
+    first_month = layout.first_month
+    if title is None and first_month == date(TEMPLATE_YEAR, 1, 1):
+        return
+
+    # Year title, a sliding window that crosses into the next year shows both (e.g. 2024-25)
+    last_year = layout.last_day.year
+    if title is None:
+        title = str(first_month.year) if last_year == first_month.year else "{}-{}".format(first_month.year, str(last_year)[2:])
+    font_size = TITLE_FONT_SIZE
+    title_font = get_font("Roboto-Bold.ttf", font_size)
+    while font_size > 20 and title_font.getlength(title) > TITLE_BOX[2] - TITLE_BOX[0] - 2 * TITLE_MARGIN:
+        font_size -= 10
+        title_font = get_font("Roboto-Bold.ttf", font_size)
+    bbox = title_font.getbbox(title)
+    title_x = (TITLE_BOX[0] + TITLE_BOX[2]) / 2 - (bbox[0] + bbox[2]) / 2
+    # A shrunk title is centered on where the full size digits would be
+    full_height = get_font("Roboto-Bold.ttf", TITLE_FONT_SIZE).getbbox("0")
+    height = title_font.getbbox("0")
+    title_top = TITLE_TOP + ((full_height[3] - full_height[1]) - (height[3] - height[1])) / 2
+    draw.rectangle(TITLE_BOX, fill = BACKGROUND_COLOR)
+    draw.text((title_x, title_top - bbox[1]), title, fill = TEXT_COLOR, font = title_font)
+
+    # Month labels only move when the panel doesn't start in January
+    if first_month.month == 1:
+        return
+
+    label_font = get_font("Roboto-Bold.ttf", LABEL_FONT_SIZE)
+    for slot, month in enumerate(layout.months()):
+        x, y = layout.month_origin(slot)
+        draw.rectangle([x + LABEL_BOX[0], y + LABEL_BOX[1], x + LABEL_BOX[2], y + LABEL_BOX[3]], fill = BACKGROUND_COLOR)
+        label = month.strftime("%B")
+        draw.text((x + LABEL_OFFSET_X, y + LABEL_OFFSET_Y - label_font.getbbox(label)[1]), label, fill = TEXT_COLOR, font = label_font)
 
 
 def get_bounds(x,y, square_offset):
@@ -138,7 +164,13 @@ def date_range(start_date, end_date):
     for n in range(int((end_date - start_date).days) + 1):
         yield start_date + timedelta(n)
 
-def get_expected_dates(start_date = datetime(datetime.now().year, 1, 1).strftime("%m/%d/%Y"), end_date = datetime.now().strftime("%m/%d/%Y")):
+def get_expected_dates(start_date = None, end_date = None):
+    # Defaults to the current year so far, worked out per call rather than once at import
+    now = datetime.now()
+    if start_date is None:
+        start_date = datetime(now.year, 1, 1).strftime("%m/%d/%Y")
+    if end_date is None:
+        end_date = now.strftime("%m/%d/%Y")
     start_date = parse_date(start_date)
     end_date = parse_date(end_date)
     expected_dates = [date.strftime("%Y-%m-%d") for date in date_range(start_date, end_date)]
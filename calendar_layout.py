@@ -0,0 +1,104 @@
+from datetime import date
+
+# Pixel layout of the month grid on infographic_template.png
+# Center of the first cell (Sunday, first week) of the top-left month
+FIRST_CELL_X = 19
+FIRST_CELL_Y = 310
+# Padding between days in the same week (e.g. 1/2/24 - 1/1/24 x value)
+DAY_PADDING = 32
+# Padding between weeks in the same month (e.g. 1/8/24 - 1/1/24 y value)
+WEEK_PADDING = 30
+# Padding between months in the same row (e.g. 2/1/24 - 1/1/24 x value)
+MONTH_PADDING = 258
+# Padding between rows of months (e.g. 5/1/24 - 1/1/24 y value)
+ROW_HEIGHT = 275
+MONTHS_PER_ROW = 4
+MONTHS_PER_PANEL = 12
+
+
+def month_index(day):
+    """
+    Returns a running month number (year * 12 + month - 1), so months from different years never collide.
+    @param day: A date.
+    """
+    return day.year * 12 + day.month - 1
+
+
+def weekday_column(day):
+    """
+    Returns the calendar column of a date, weeks start on Sunday so Sunday = 0 and Saturday = 6.
+    @param day: A date.
+    """
+    return (day.weekday() + 1) % 7
+
+
+class CalendarLayout:
+    """
+    Maps dates straight to calendar cells for a 12-month panel, in O(1) per date with no scanning of other dates.
+    A panel can start on any month, so it covers a calendar year (start in January) or a sliding 12-month window.
+    """
+
+    def __init__(self, first_month):
+        """
+        @param first_month: A date in the first month shown in the top-left slot of the panel.
+        """
+        self.first_month = date(first_month.year, first_month.month, 1)
+        self.first_index = month_index(self.first_month)
+
+    @classmethod
+    def for_year(cls, year):
+        return cls(date(year, 1, 1))
+
+    @classmethod
+    def ending_at(cls, last_day):
+        """
+        Returns the sliding 12-month window whose last month contains last_day.
+        @param last_day: A date in the last month of the window.
+        """
+        index = month_index(last_day) - (MONTHS_PER_PANEL - 1)
+        return cls(date(index // 12, index % 12 + 1, 1))
+
+    @property
+    def last_day(self):
+        # Day before the first month of the next panel
+        index = self.first_index + MONTHS_PER_PANEL
+        return date.fromordinal(date(index // 12, index % 12 + 1, 1).toordinal() - 1)
+
+    def months(self):
+        """
+        Returns the first day of every month in the panel, in slot order.
+        """
+        return [date((self.first_index + slot) // 12, (self.first_index + slot) % 12 + 1, 1) for slot in range(MONTHS_PER_PANEL)]
+
+    def slot(self, day):
+        """
+        Returns the month slot (0-11) a date falls in, or None if it is outside the panel.
+        @param day: A date.
+        """
+        slot = month_index(day) - self.first_index
+        if 0 <= slot < MONTHS_PER_PANEL:
+            return slot
+        return None
+
+    def month_origin(self, slot):
+        """
+        Returns the center of the first cell (Sunday, first week) of a month slot.
+        @param slot: A month slot from 0 to 11.
+        """
+        return (FIRST_CELL_X + (slot % MONTHS_PER_ROW) * MONTH_PADDING,
+                FIRST_CELL_Y + (slot // MONTHS_PER_ROW) * ROW_HEIGHT)
+
+    def cell_center(self, day):
+        """
+        Returns the (x, y) center of a date's square, or None if the date is outside the panel.
+        @param day: A date.
+        """
+        slot = self.slot(day)
+        if slot is None:
+            return None
+
+        x, y = self.month_origin(slot)
+        # The week row depends on which weekday the month starts on
+        first_column = weekday_column(day.replace(day=1))
+        week = (day.day - 1 + first_column) // 7
+        return x + weekday_column(day) * DAY_PADDING, y + week * WEEK_PADDING
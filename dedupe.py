@@ -0,0 +1,185 @@
+import json
+import os
+
+from result_cache import cache_key, file_signature
+
+DEFAULT_HASH_INDEX_PATH = ".connections_hashes.json"
+# Bump whenever the hash itself changes so old hashes are recomputed
+HASH_INDEX_VERSION = 1
+# 8x8 difference hash, 64 bits
+HASH_SIZE = 8
+# Hashes at most this many bits apart count as the same screenshot (re-saves, re-encodes, small resizes)
+DUPLICATE_DISTANCE = 4
+
+
+def perceptual_hash(image_path):
+    """
+    Returns a 64-bit difference hash of an image from a reduced grayscale decode, or None if it can't be read.
+    Nearly identical images (the same screenshot re-saved or re-encoded) get hashes only a few bits apart.
+    @param image_path: The path for the image to hash.
+    """
+    import cv2
+
+    # Quarter-size grayscale decode, the hash only needs a 9x8 thumbnail
+    image = cv2.imread(image_path, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if image is None:
+        image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    return difference_hash(image)
+
+
+def perceptual_hash_bytes(image_bytes):
+    """
+    Same as perceptual_hash for an encoded image held in memory, e.g. a member read from a zip or tar archive.
+    @param image_bytes: The encoded image as bytes.
+    """
+    import cv2
+    import numpy as np
+
+    buffer = np.frombuffer(image_bytes, dtype=np.uint8)
+    image = cv2.imdecode(buffer, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if image is None:
+        image = cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE)
+    return difference_hash(image)
+
+
+def difference_hash(image):
+    import cv2
+    import numpy as np
+
+    if image is None:
+        return None
+    small = cv2.resize(image, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    # One bit per pixel: is it brighter than its left neighbour
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(first, second):
+    return bin(first ^ second).count("1")
+
+
+class HashIndex:
+    """
+    On-disk index of perceptual hashes keyed on (path, size, mtime), so each screenshot is only ever hashed once.
+    Archive members are keyed like the result cache, "<archive path>::<member name>" with the archive's signature.
+    Usage: index = HashIndex(); index.hash(path); index.save()
+    """
+
+    def __init__(self, index_path = DEFAULT_HASH_INDEX_PATH):
+        self.index_path = index_path
+        self.entries = {}
+        self.computed = 0
+        self.load()
+
+    def load(self):
+        # Start from an empty index if the file is missing, unreadable, or from another hash version
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if stored.get("version") == HASH_INDEX_VERSION:
+            self.entries = stored.get("entries", {})
+
+    def get(self, image_path):
+        """
+        Returns the stored hash for an unchanged image, or None.
+        """
+        entry = self.entries.get(cache_key(image_path))
+        try:
+            signature = file_signature(image_path)
+        except OSError:
+            return None
+        if entry is None or entry["signature"] != signature or entry["hash"] is None:
+            return None
+        return int(entry["hash"], 16)
+
+    def hash(self, image_path, read = None):
+        """
+        Returns the hash of an image, computing and storing it when it isn't indexed yet. None for unreadable files.
+        @param image_path: The path for the image, or the "<archive path>::<member name>" of an archive member.
+        @param read: For archive members, a function returning the member's bytes. Only called when the hash isn't indexed.
+        """
+        value = self.get(image_path)
+        if value is None:
+            value = perceptual_hash(image_path) if read is None else perceptual_hash_bytes(read())
+            self.computed += 1
+            if value is not None:
+                self.entries[cache_key(image_path)] = {"signature": file_signature(image_path), "hash": format(value, "016x")}
+        return value
+
+    def save(self):
+        # Drop entries for files (or archives) that are gone or changed, then swap the file in atomically like ResultCache
+        stale = []
+        for key, entry in self.entries.items():
+            try:
+                if file_signature(key) != entry["signature"]:
+                    stale.append(key)
+            except OSError:
+                stale.append(key)
+        for key in stale:
+            del self.entries[key]
+
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": HASH_INDEX_VERSION, "entries": self.entries}, f)
+        os.replace(temp_path, self.index_path)
+
+
+class DuplicateFilter:
+    """
+    Collapses images of the same date that show the same screenshot, wherever they come from: the folder, its archives, or both.
+    Images are checked in the order they are ingested (archives first, then the folder by date and filename) and the first of each
+    distinct image is kept. Plain screenshots are only hashed once a second image with their date turns up. Archive members are
+    hashed as they are read, since their bytes can't be read again later.
+    Usage: duplicates = DuplicateFilter(HashIndex()); if duplicates.check(date, path) is None: analyze(path)
+    """
+
+    def __init__(self, index, compute = True):
+        """
+        @param index: A HashIndex.
+        @param compute: True or False, False only uses hashes already in the index (no image decoding) and keeps unhashed images.
+        """
+        self.index = index
+        self.compute = compute
+        # {date: [[path, hash, hashed], ...]} for the images kept so far
+        self.kept = {}
+        # {kept path: [duplicate paths]}
+        self.collapsed = {}
+
+    def hash_of(self, image_path, read = None):
+        if self.compute:
+            return self.index.hash(image_path, read)
+        return self.index.get(image_path)
+
+    def check(self, game_date, image_path, read = None):
+        """
+        Returns the kept path an image duplicates, or None when the image is kept and should be analyzed.
+        @param game_date: The date from the image's name.
+        @param image_path: The path for the image, or the "<archive path>::<member name>" of an archive member.
+        @param read: For archive members, a function returning the member's bytes.
+        """
+        kept = self.kept.setdefault(game_date, [])
+        value = None
+        hashed = read is not None and self.compute
+        if hashed or kept:
+            value = self.hash_of(image_path, read)
+            hashed = True
+
+        if value is not None:
+            for entry in kept:
+                if not entry[2]:
+                    entry[1] = self.hash_of(entry[0])
+                    entry[2] = True
+                if entry[1] is not None and hamming_distance(value, entry[1]) <= DUPLICATE_DISTANCE:
+                    self.collapsed.setdefault(entry[0], []).append(image_path)
+                    return entry[0]
+
+        kept.append([image_path, value, hashed])
+        return None
+
+
+def print_collapsed(collapsed):
+    for original, duplicates in collapsed.items():
+        print("Skipped", len(duplicates), "duplicate(s) of", original, "-", ", ".join(os.path.basename(path) for path in duplicates))
@@ -0,0 +1,16 @@
+# Detector settings that other modules need without loading OpenCV, screenshot_processing re-exports them
+
+# Bump whenever the rectangle detection or result format changes so cached results are invalidated
+DETECTOR_VERSION = 1
+
+# Default color threshold values based on NYT Connections colors
+# green = (160,195,90)
+# yellow = (249,223,109)
+# blue = (176,196,239)
+# purple = (186,129,197)
+DEFAULT_COLOR_THRESHOLDS = {
+    "green": ((140, 180, 70), (180, 210, 110)),
+    "yellow": ((230, 200, 80), (255, 230, 130)),
+    "blue": ((150, 170, 220), (185, 205, 250)),
+    "purple": ((170, 110, 180), (195, 140, 210)),
+}
@@ -0,0 +1,69 @@
+import re
+
+# Helpers for walking game data without loading NumPy, so rendering from cached json results stays light
+
+# Screenshots without a date in the filename get this date from find_rectangles
+MISSING_DATE_STR = "9999-99-99"
+# Screenshot names carry the game date as YYYY-MM-DD
+DATE_PATTERN = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+# Screenshots read straight from a zip/tar archive are named "<archive path>::<member name>"
+ARCHIVE_SEPARATOR = "::"
+
+
+def member_name(image_name):
+    """
+    Returns the member name of a screenshot inside an archive, or the name unchanged for a plain file.
+    @param image_name: The file name or path of the screenshot.
+    """
+    _, separator, member = image_name.partition(ARCHIVE_SEPARATOR)
+    return member if separator else image_name
+
+
+def date_from_name(image_name):
+    """
+    Returns the 'YYYY-MM-DD' date in a screenshot name, or MISSING_DATE_STR when there is none.
+    For screenshots inside an archive only the member name is searched, never the archive's own name.
+    @param image_name: The file name or path of the screenshot.
+    """
+    match = DATE_PATTERN.search(member_name(image_name))
+    # Fine to still run without a date, just use outlier value to highlight issue
+    return match.group(0) if match else MISSING_DATE_STR
+
+
+def group_by_month(results):
+    """
+    Groups json objects as returned by find_rectangles into the nested {(year, month): {index: game}} dictionary.
+    Months are keyed with their year so histories spanning several years stay in date order when iterated.
+    Indexes start at 1 and run across months, games without a date go under (9999, 99).
+    @param results: An iterable of json objects, in the order they should be drawn.
+    """
+    monthly_data = {}
+    for index, game in enumerate(results, start=1):
+        month = (int(game['Date'][:4]), int(game['Date'][5:7])) if game['Date'] != MISSING_DATE_STR else (9999, 99)
+        monthly_data.setdefault(month, {})[index] = game
+    return monthly_data
+
+
+def iter_games(data):
+    """
+    Yields every game in either a GameStore or a nested {(year, month): {index: game}} dictionary.
+    @param data: A GameStore, or a dictionary of NYT Connections data grouped by month.
+    """
+    # Checked by attribute so this module never has to import game_store (and NumPy)
+    if hasattr(data, "to_monthly_dict"):
+        yield from data.games()
+        return
+
+    # First level is just indexes, second level has actual game data
+    for sub_dict in data.values():
+        yield from sub_dict.values()
+
+
+def as_monthly_dict(data):
+    """
+    Returns the nested {(year, month): {index: game}} dictionary for either a GameStore or a dictionary that already has that shape.
+    @param data: A GameStore, or a dictionary of NYT Connections data grouped by month.
+    """
+    if hasattr(data, "to_monthly_dict"):
+        return data.to_monthly_dict()
+    return data
@@ -0,0 +1,161 @@
+import numpy as np
+from datetime import date
+
+# iter_games and as_monthly_dict live in the NumPy-free game_data module, re-exported here
+from game_data import MISSING_DATE_STR, group_by_month, iter_games, as_monthly_dict
+
+# Guess colors are stored as small integer codes, index in this list = code
+COLOR_NAMES = ["Incorrect", "Yellow", "Green", "Blue", "Purple", "Unknown color"]
+COLOR_CODES = {name: code for code, name in enumerate(COLOR_NAMES)}
+# Padding value for guesses that weren't made
+NO_GUESS = -1
+# A game ends after 4 correct guesses or 4 mistakes, so 7 is the real maximum - 8 leaves room for misreads
+MAX_GUESSES = 8
+
+# Screenshots without a date in the filename get "9999-99-99", which is stored as this ordinal so it sorts last
+MISSING_DATE = np.iinfo(np.int32).max
+
+# One fixed-size record per game, 14 bytes each
+GAME_DTYPE = np.dtype([
+    ("date", np.int32),
+    ("won", np.bool_),
+    ("guesses", np.int8),
+    ("colors", np.int8, (MAX_GUESSES,)),
+])
+
+
+def date_to_ordinal(date_str):
+    """
+    Converts a 'YYYY-MM-DD' string to a proleptic Gregorian ordinal, or MISSING_DATE if it isn't a valid date.
+    """
+    try:
+        return date.fromisoformat(date_str).toordinal()
+    except ValueError:
+        return MISSING_DATE
+
+
+def ordinal_to_date(ordinal):
+    """
+    Converts an ordinal back to a 'YYYY-MM-DD' string, the inverse of date_to_ordinal.
+    """
+    if ordinal == MISSING_DATE:
+        return MISSING_DATE_STR
+    return date.fromordinal(int(ordinal)).isoformat()
+
+
+class GameStore:
+    """
+    Compact, array-backed store of NYT Connections games, sorted by date.
+    Each game is one GAME_DTYPE record: the date as an ordinal, won as a bool, the guess count, and the guess colors as int8 codes.
+    Use from_results/from_monthly_dict and to_results/to_monthly_dict to convert from and to the json-style dictionaries.
+    """
+    __slots__ = ("records",)
+
+    def __init__(self, records = None):
+        if records is None:
+            records = np.zeros(0, dtype=GAME_DTYPE)
+        # Stable sort keeps same-day games in the order they were given
+        self.records = np.sort(np.asarray(records, dtype=GAME_DTYPE), order="date", kind="stable")
+
+    @classmethod
+    def from_results(cls, results):
+        """
+        Builds a store from json objects as returned by find_rectangles.
+        @param results: An iterable of json objects.
+        """
+        results = list(results)
+        records = np.zeros(len(results), dtype=GAME_DTYPE)
+        records["colors"] = NO_GUESS
+
+        for row, game in enumerate(results):
+            records["date"][row] = date_to_ordinal(game['Date'])
+            records["won"][row] = game['Result'] == "Won"
+            records["guesses"][row] = game['Guesses']
+            for guess_number, color in game['Data'].items():
+                if 1 <= int(guess_number) <= MAX_GUESSES:
+                    records["colors"][row, int(guess_number) - 1] = COLOR_CODES.get(color, COLOR_CODES["Unknown color"])
+
+        return cls(records)
+
+    @classmethod
+    def from_monthly_dict(cls, data):
+        """
+        Builds a store from the nested {(year, month): {index: game}} dictionary used by draw_calendar and stats_draw.
+        @param data: A dictionary of NYT Connections data grouped by month.
+        """
+        return cls.from_results(game for sub_dict in data.values() for game in sub_dict.values())
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def dates(self):
+        return self.records["date"]
+
+    @property
+    def won(self):
+        return self.records["won"]
+
+    @property
+    def guesses(self):
+        return self.records["guesses"]
+
+    @property
+    def colors(self):
+        return self.records["colors"]
+
+    def index_of(self, date_str):
+        """
+        Returns the row of the first game on a date, or None if no game was played that day. O(log n) on the sorted dates.
+        @param date_str: A date string in 'YYYY-MM-DD' format.
+        """
+        ordinal = date_to_ordinal(date_str)
+        row = int(np.searchsorted(self.dates, ordinal))
+        if row < len(self.records) and self.dates[row] == ordinal:
+            return row
+        return None
+
+    def between(self, start_date, end_date):
+        """
+        Returns a new store with the games from start_date to end_date, both inclusive.
+        @param start_date: A date string in 'YYYY-MM-DD' format.
+        @param end_date: A date string in 'YYYY-MM-DD' format.
+        """
+        start = np.searchsorted(self.dates, date_to_ordinal(start_date), side="left")
+        end = np.searchsorted(self.dates, date_to_ordinal(end_date), side="right")
+        return GameStore(self.records[start:end])
+
+    def game(self, row):
+        """
+        Returns a single game as a json object in the same format as find_rectangles.
+        @param row: The row of the game in the store.
+        """
+        record = self.records[row]
+        guess_data = {}
+        for index, code in enumerate(record["colors"].tolist(), start=1):
+            if code == NO_GUESS:
+                break
+            guess_data[index] = COLOR_NAMES[code]
+
+        return {
+            'Date': ordinal_to_date(record["date"]),
+            'Result': "Won" if record["won"] else "Lost",
+            'Guesses': int(record["guesses"]),
+            'Data': guess_data
+        }
+
+    def games(self):
+        """
+        Yields every game as a json object, in date order.
+        """
+        for row in range(len(self.records)):
+            yield self.game(row)
+
+    def to_results(self):
+        return list(self.games())
+
+    def to_monthly_dict(self):
+        """
+        Converts the store back to the nested {(year, month): {index: game}} dictionary, indexes start at 1 and run across months.
+        """
+        return group_by_month(self.games())
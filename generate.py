@@ -1,31 +1,349 @@
-from screenshot_processing import *
-from calendar_draw import *
-from stats_draw import *
-import os; from os import listdir
-from datetime import datetime
-from collections import defaultdict
-
-def create_infographic(folder_path = "NYT_Connections"):
-    # Create the initial collection dictionary
-    connections_data = {}
-
-    # Loop through folder, analyzing each image and adding the data to the dictionary
-    for index, image in enumerate(os.listdir(folder_path)):
-        data = find_rectangles(os.path.join(folder_path, image))
-        connections_data = {**connections_data, index+1: data}
-
-    # Construct new dictionary which breaks data down by month for easier processing
-    monthly_connections_data = defaultdict(dict)
-    # Finish constructing the dictionary
-    for index, data in connections_data.items():
-        date_str = data['Date']
-        date = datetime.strptime(date_str, '%Y-%m-%d')
-        month = date.month
-        monthly_connections_data[month][index] = data
-
-    # Call infographic processing libraries
-    # Calendar drawing comes first, otherwise image saving doesn't work properly
-    draw_calendar(monthly_connections_data)
-    draw_infographics(monthly_connections_data)
-
-create_infographic()
\ No newline at end of file
+import argparse
+import json
+
+from dedupe import HashIndex, DEFAULT_HASH_INDEX_PATH, DuplicateFilter, print_collapsed
+from result_cache import ResultCache, DEFAULT_CACHE_PATH
+
+# Heavy dependencies (OpenCV, NumPy, PIL) are imported inside the functions that need them,
+# so rendering or printing stats from cached results never loads OpenCV and importing this module does no work
+
+DEFAULT_FOLDER = "NYT_Connections"
+DEFAULT_OUTPUT = "infographic.png"
+
+
+def duplicate_filter(hash_index_path = DEFAULT_HASH_INDEX_PATH, compute = True):
+    """
+    Returns the DuplicateFilter shared by a folder's archives and screenshots, or None when duplicates are kept.
+    @param hash_index_path: The perceptual hash index file, pass None to keep every screenshot.
+    @param compute: True or False, False only reads hashes already in the index so no image is decoded.
+    """
+    return DuplicateFilter(HashIndex(hash_index_path), compute) if hash_index_path else None
+
+
+def finish_duplicates(duplicates):
+    """
+    Lists the skipped duplicates and saves any new hashes, once the filter has seen every archive and screenshot.
+    @param duplicates: A DuplicateFilter, or None.
+    """
+    if duplicates is None or not duplicates.compute:
+        return
+    print_collapsed(duplicates.collapsed)
+    if duplicates.index.computed:
+        duplicates.index.save()
+
+
+def cached_results(folder_path = DEFAULT_FOLDER, cache_path = DEFAULT_CACHE_PATH, hash_index_path = DEFAULT_HASH_INDEX_PATH):
+    """
+    Returns (results, missing): the cached json objects in date order, and the paths of screenshots that have no cached result yet.
+    Never analyzes or decodes anything, so it is cheap enough for every render. Duplicates already found by analyze are left out.
+    @param folder_path: The folder holding the screenshots.
+    @param cache_path: The result cache file.
+    @param hash_index_path: The perceptual hash index file, pass None to keep every screenshot.
+    """
+    from ingest import list_archives, scan_screenshots, screenshot_date, unique_screenshots
+
+    cache = ResultCache(cache_path)
+    duplicates = duplicate_filter(hash_index_path, compute=False)
+    results = []
+    missing = []
+
+    # Archive members are looked up by the archive's name, the archive itself isn't opened.
+    # They go through the duplicate filter first, the same order analyze uses
+    for archive_path in list_archives(folder_path):
+        archived = cache.archive_results(archive_path)
+        if not archived:
+            missing.append(archive_path)
+        results.extend(data for member_path, data in archived
+                       if duplicates is None or duplicates.check(screenshot_date(member_path), member_path) is None)
+
+    screenshots = scan_screenshots(folder_path)
+    if duplicates is not None:
+        screenshots = unique_screenshots(screenshots, duplicates)
+    for _, image_path in screenshots:
+        data = cache.get(image_path)
+        if data is None:
+            missing.append(image_path)
+        else:
+            results.append(data)
+
+    results.sort(key=lambda game: game['Date'])
+    return results, missing
+
+
+def successful(outcomes):
+    """
+    Yields the json object of every successful (image_path, json_object, error) outcome, printing the failures.
+    @param outcomes: An iterable of outcomes, e.g. from ingest.iter_results.
+    """
+    for image_path, data, error in outcomes:
+        if error is not None:
+            print("Failed to analyze", image_path, "-", error)
+            continue
+        yield data
+
+
+def analyze_folder(folder_path = DEFAULT_FOLDER, cache_path = DEFAULT_CACHE_PATH, workers = 1, hash_index_path = DEFAULT_HASH_INDEX_PATH):
+    """
+    Analyzes every screenshot that isn't in the result cache and returns all results in date order.
+    Zip and tar archives in the folder are read in place, without extracting them.
+    @param folder_path: The folder holding the screenshots and archives of screenshots, or a single archive.
+    @param cache_path: The result cache file, pass None to disable the cache.
+    @param workers: Worker processes for the analysis, defaults to 1.
+    @param hash_index_path: The perceptual hash index file, pass None to analyze duplicate screenshots too.
+    """
+    from ingest import iter_results, iter_archive_results, list_archives, scan_screenshots
+
+    cache = ResultCache(cache_path) if cache_path else None
+    duplicates = duplicate_filter(hash_index_path)
+    results = list(successful(iter_archive_results(list_archives(folder_path), cache, workers, duplicates=duplicates)))
+    results.extend(successful(iter_results(scan_screenshots(folder_path), cache, workers, duplicates=duplicates)))
+    # Stable sort, so games from the folder keep their filename order within a date
+    results.sort(key=lambda game: game['Date'])
+    finish_duplicates(duplicates)
+
+    if cache:
+        cache.save()
+        print("Result cache: {hits} hits, {misses} misses".format(**cache.stats()))
+    return results
+
+
+def create_infographic(folder_path = DEFAULT_FOLDER, cache_path = DEFAULT_CACHE_PATH, workers = 1, output = DEFAULT_OUTPUT, show = True, hash_index_path = DEFAULT_HASH_INDEX_PATH):
+    """
+    Analyzes the screenshot folder and draws the infographic, the whole pipeline in one call.
+    Screenshots stream through analysis and drawing one at a time in date order, so no list of results or images is built up.
+    Zip and tar archives in the folder are read in place first, only their small json results are kept and merged into the stream by date.
+    @param folder_path: The folder holding the screenshots and archives of screenshots, or a single archive. Defaults to NYT_Connections.
+    @param cache_path: The result cache file, pass None to disable the cache.
+    @param workers: Worker processes for the analysis, defaults to 1.
+    @param output: The image file to write, defaults to infographic.png.
+    @param show: True or False, toggles opening the finished image.
+    @param hash_index_path: The perceptual hash index file, pass None to analyze duplicate screenshots too.
+    Returns the StatsAccumulator holding every game that was drawn.
+    """
+    import heapq
+    from datetime import date
+    from calendar_layout import CalendarLayout
+    from ingest import iter_results, iter_archive_results, list_archives, latest_year, scan_screenshots
+    from render import draw_infographic_stream, encode_image
+    from stats_engine import StatsAccumulator
+
+    # Previously analyzed screenshots are loaded from the result cache
+    cache = ResultCache(cache_path) if cache_path else None
+    # Images sharing a date are hashed so duplicates are collapsed before find_rectangles ever runs, across archives and the folder alike
+    duplicates = duplicate_filter(hash_index_path)
+
+    # Archives can't be streamed in date order, each one is read once in archive order and its results sorted
+    archived = sorted(successful(iter_archive_results(list_archives(folder_path), cache, workers, duplicates=duplicates)), key=lambda game: game['Date'])
+
+    # Dates come from the filenames, so the calendar year is known before anything is analyzed
+    screenshots = scan_screenshots(folder_path)
+    layout = CalendarLayout.for_year(latest_year(screenshots + [(game['Date'], None) for game in archived]) or date.today().year)
+
+    # Archive members come first within a date, the same order as analyze_folder, cached_results and watch
+    games = heapq.merge(archived, successful(iter_results(screenshots, cache, workers, duplicates=duplicates)), key=lambda game: game['Date'])
+    stats = StatsAccumulator()
+    image = draw_infographic_stream(games, layout, stats=stats)
+    finish_duplicates(duplicates)
+
+    if cache:
+        cache.save()
+        print("Result cache: {hits} hits, {misses} misses".format(**cache.stats()))
+
+    encode_image(image, output)
+    if show:
+        image.show()
+    return stats
+
+
+def render_cached(folder_path = DEFAULT_FOLDER, cache_path = DEFAULT_CACHE_PATH, output = DEFAULT_OUTPUT, show = False, trends = False, hash_index_path = DEFAULT_HASH_INDEX_PATH):
+    """
+    Draws the infographic from cached results only, without loading OpenCV (or NumPy, unless trends are on). Screenshots that were never analyzed are left out.
+    @param folder_path: The folder holding the screenshots.
+    @param cache_path: The result cache file.
+    @param output: The image file to write, defaults to infographic.png.
+    @param show: True or False, toggles opening the finished image.
+    @param trends: True or False, toggles the rolling trend panel below the stats.
+    @param hash_index_path: The perceptual hash index file, pass None to keep duplicate screenshots.
+    """
+    from game_data import group_by_month
+    from render import draw_infographic_image, encode_image
+
+    results, missing = cached_results(folder_path, cache_path, hash_index_path)
+    if missing:
+        print(len(missing), "screenshot(s) have not been analyzed yet, run the analyze command to include them")
+
+    # Stable sort by date matches the GameStore order create_infographic draws in
+    image = draw_infographic_image(group_by_month(sorted(results, key=lambda game: game['Date'])), trends=trends)
+    encode_image(image, output)
+    if show:
+        image.show()
+
+
+def cached_stats(folder_path = DEFAULT_FOLDER, cache_path = DEFAULT_CACHE_PATH, hash_index_path = DEFAULT_HASH_INDEX_PATH):
+    """
+    Returns the infographic statistics for the cached results as a json-ready dictionary.
+    @param folder_path: The folder holding the screenshots.
+    @param cache_path: The result cache file.
+    @param hash_index_path: The perceptual hash index file, pass None to keep duplicate screenshots.
+    """
+    from game_data import group_by_month
+    from stats_engine import StatsAccumulator
+
+    results, missing = cached_results(folder_path, cache_path, hash_index_path)
+    stats = StatsAccumulator.from_data(group_by_month(sorted(results, key=lambda game: game['Date'])))
+    summary = stats.to_json()
+    summary["not_analyzed"] = len(missing)
+    return summary
+
+
+def render_log(log_path, output = DEFAULT_OUTPUT, show = False, trends = False):
+    """
+    Draws the infographic from a results log, no screenshots or result cache needed.
+    @param log_path: The results log file.
+    @param output: The image file to write, defaults to infographic.png.
+    @param show: True or False, toggles opening the finished image.
+    @param trends: True or False, toggles the rolling trend panel below the stats.
+    """
+    from results_log import ResultsLog
+    from render import draw_infographic_image, encode_image
+
+    image = draw_infographic_image(ResultsLog(log_path).store(), trends=trends)
+    encode_image(image, output)
+    if show:
+        image.show()
+
+
+def log_stats(log_path):
+    """
+    Returns the infographic statistics for a results log as a json-ready dictionary.
+    @param log_path: The results log file.
+    """
+    from results_log import ResultsLog
+    from stats_engine import StatsAccumulator
+
+    return StatsAccumulator.from_data(ResultsLog(log_path).store()).to_json()
+
+
+def render_all_views(folder_path = DEFAULT_FOLDER, cache_path = DEFAULT_CACHE_PATH, output_dir = "views", kinds = ("year", "quarter", "month"), log_path = None,
+                     image_format = "PNG", palette = False, compress_level = None, quality = None, workers = None, hash_index_path = DEFAULT_HASH_INDEX_PATH):
+    """
+    Renders a year, quarter and month infographic (or any subset of those kinds) from cached results or a results log in one batch.
+    Returns a dictionary of {view name: path}.
+    @param folder_path: The folder holding the screenshots.
+    @param cache_path: The result cache file.
+    @param output_dir: The folder the images are written to, defaults to views.
+    @param kinds: Any of "year", "quarter" and "month", defaults to all three.
+    @param log_path: An optional results log to read instead of the result cache.
+    @param image_format, palette, compress_level, quality: Output encoding, see render.encode_image.
+    @param workers: Encoder threads, defaults to one per CPU.
+    @param hash_index_path: The perceptual hash index file, pass None to keep duplicate screenshots.
+    """
+    from render_plan import MonthlyAggregates, plan_views, render_views
+
+    if log_path:
+        from results_log import ResultsLog
+        data = ResultsLog(log_path).store()
+    else:
+        from game_data import group_by_month
+        results, missing = cached_results(folder_path, cache_path, hash_index_path)
+        if missing:
+            print(len(missing), "screenshot(s) have not been analyzed yet, run the analyze command to include them")
+        data = group_by_month(sorted(results, key=lambda game: game['Date']))
+
+    aggregates = MonthlyAggregates(data)
+    return render_views(aggregates, plan_views(aggregates, kinds), output_dir, image_format, palette, compress_level, quality, workers)
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Build an infographic from NYT Connections result screenshots.")
+    parser.add_argument("--folder", default=DEFAULT_FOLDER, help="Folder holding the screenshots.")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Result cache file.")
+    parser.add_argument("--hash-index", default=DEFAULT_HASH_INDEX_PATH, help="Perceptual hash index used to skip duplicate screenshots.")
+    parser.add_argument("--keep-duplicates", action="store_true", help="Analyze every screenshot, even repeats of the same day.")
+    subparsers = parser.add_subparsers(dest="command", help="Runs the whole pipeline when omitted.")
+
+    analyze_parser = subparsers.add_parser("analyze", help="Analyze new or changed screenshots into the result cache.")
+    analyze_parser.add_argument("--workers", type=int, default=None, help="Worker processes, defaults to one per CPU.")
+
+    render_parser = subparsers.add_parser("render", help="Draw the infographic from cached results, without OpenCV.")
+    render_parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Image file to write.")
+    render_parser.add_argument("--show", action="store_true", help="Open the image when done.")
+    render_parser.add_argument("--trends", action="store_true", help="Add the 7/30/90-day rolling trend panel below the stats.")
+    render_parser.add_argument("--log", help="Draw from this results log instead of the result cache.")
+
+    stats_parser = subparsers.add_parser("stats", help="Print the statistics for the cached results as JSON.")
+    stats_parser.add_argument("--log", help="Read from this results log instead of the result cache.")
+
+    log_parser = subparsers.add_parser("log", help="Write a results log from the result cache, or convert one from or to JSON.")
+    log_parser.add_argument("action", choices=["write", "import", "export"], help="write: replace the log with the cached results. import/export: append from or write to --json.")
+    log_parser.add_argument("log", help="The results log file.")
+    log_parser.add_argument("--json", help="The JSON file for import and export.")
+
+    views_parser = subparsers.add_parser("views", help="Draw one infographic per year, quarter and month from cached results in one batch.")
+    views_parser.add_argument("--output-dir", default="views", help="Folder the images are written to.")
+    views_parser.add_argument("--kinds", nargs="+", choices=["year", "quarter", "month"], default=["year", "quarter", "month"], help="Which views to draw.")
+    views_parser.add_argument("--log", help="Draw from this results log instead of the result cache.")
+    views_parser.add_argument("--format", choices=["png", "webp"], default="png", help="Output image format.")
+    views_parser.add_argument("--palette", action="store_true", help="Store views with an exact color palette when they have at most 256 colors, lossless and much smaller.")
+    views_parser.add_argument("--compress-level", type=int, choices=range(10), metavar="0-9", help="PNG compression level, lower is faster.")
+    views_parser.add_argument("--quality", type=int, help="WebP quality from 0 to 100, lossless when omitted.")
+    views_parser.add_argument("--workers", type=int, default=None, help="Encoder threads, defaults to one per CPU.")
+
+    watch_parser = subparsers.add_parser("watch", help="Keep the infographic up to date as screenshots are added.")
+    watch_parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Image file to write.")
+    watch_parser.add_argument("--interval", type=float, default=1.0, help="Seconds between folder checks.")
+
+    team_parser = subparsers.add_parser("team", help="Analyze and render every user folder in a directory on one shared worker pool.")
+    team_parser.add_argument("root", help="Directory holding one screenshot folder per user.")
+    team_parser.add_argument("--output-dir", default="infographics", help="Folder the per-user infographics and summary.json are written to.")
+    team_parser.add_argument("--workers", type=int, default=None, help="Worker processes, defaults to one per CPU.")
+
+    serve_parser = subparsers.add_parser("serve", help="Serve the infographic and JSON stats over HTTP, refreshing as screenshots are added.")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Address to listen on.")
+    serve_parser.add_argument("--port", type=int, default=8000, help="Port to listen on.")
+    serve_parser.add_argument("--interval", type=float, default=5.0, help="Seconds between folder checks.")
+
+    args = parser.parse_args(argv)
+    hash_index_path = None if args.keep_duplicates else args.hash_index
+
+    if args.command == "analyze":
+        results = analyze_folder(args.folder, args.cache, args.workers, hash_index_path)
+        print("Analyzed", len(results), "screenshot(s)")
+    elif args.command == "render" and args.log:
+        render_log(args.log, args.output, args.show, args.trends)
+    elif args.command == "render":
+        render_cached(args.folder, args.cache, args.output, args.show, args.trends, hash_index_path)
+    elif args.command == "stats":
+        print(json.dumps(log_stats(args.log) if args.log else cached_stats(args.folder, args.cache, hash_index_path), indent=2))
+    elif args.command == "log":
+        from results_log import ResultsLog
+        if args.action == "write":
+            results, missing = cached_results(args.folder, args.cache, hash_index_path)
+            ResultsLog.create(args.log, results)
+            print("Wrote", len(results), "game(s) to", args.log, "-", len(missing), "screenshot(s) not analyzed yet")
+        elif not args.json:
+            parser.error("log import and export need --json")
+        elif args.action == "import":
+            print("Imported", ResultsLog(args.log, create=True).import_json(args.json), "game(s)")
+        else:
+            ResultsLog(args.log).export_json(args.json)
+    elif args.command == "views":
+        outputs = render_all_views(args.folder, args.cache, args.output_dir, args.kinds, args.log, args.format.upper(),
+                                   args.palette, args.compress_level, args.quality, args.workers, hash_index_path)
+        print("Wrote", len(outputs), "view(s) to", args.output_dir)
+    elif args.command == "watch":
+        from watch import watch
+        watch(args.folder, args.output, args.cache, args.interval, hash_index_path)
+    elif args.command == "team":
+        from team_batch import run_team, print_summary
+        print_summary(run_team(args.root, args.output_dir, args.cache, args.workers, hash_index_path=hash_index_path))
+    elif args.command == "serve":
+        from server import serve
+        serve(args.folder, args.cache, args.host, args.port, args.interval, hash_index_path)
+    else:
+        create_infographic(args.folder, args.cache, hash_index_path=hash_index_path)
+
+
+# Guard is required so worker processes can import this module without re-running the whole pipeline
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import os
+import tarfile
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import date
+from functools import lru_cache, partial
+
+from game_data import ARCHIVE_SEPARATOR, MISSING_DATE_STR, date_from_name
+
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+# Only these archive members are analyzed, archives often carry folders and metadata files too
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp")
+
+
+def is_archive(path):
+    return path.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def list_archives(folder_path):
+    """
+    Returns the zip and tar archives in a folder sorted by name, or [folder_path] when it is an archive itself.
+    @param folder_path: A folder holding screenshots and archives of screenshots, or a single archive.
+    """
+    if os.path.isfile(folder_path):
+        return [folder_path] if is_archive(folder_path) else []
+    with os.scandir(folder_path) as scanned:
+        return sorted(entry.path for entry in scanned if entry.is_file() and is_archive(entry.name))
+
+
+def scan_screenshots(folder_path):
+    """
+    Lists the screenshots in a folder with os.scandir and returns (date, path) pairs in the order the games should be drawn:
+    by the date in the filename, then by filename, with undated or invalid dates last. No image is opened.
+    Only image files count (IMAGE_EXTENSIONS, like archive members), so notes or .DS_Store files never reach the detector.
+    Archives are left out, they are read by iter_archive_results. A single archive in place of the folder has no plain screenshots.
+    @param folder_path: The folder holding the screenshots.
+    """
+    if os.path.isfile(folder_path) and is_archive(folder_path):
+        return []
+
+    entries = []
+    with os.scandir(folder_path) as scanned:
+        for entry in scanned:
+            if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                entries.append((screenshot_date(entry.path), entry.name, entry.path))
+
+    entries.sort()
+    return [(game_date, path) for game_date, _, path in entries]
+
+
+def screenshot_date(image_path):
+    """
+    Returns the valid 'YYYY-MM-DD' date in a screenshot's name, or MISSING_DATE_STR when there is none.
+    @param image_path: The path for the screenshot, or the "<archive path>::<member name>" of an archive member.
+    """
+    game_date = date_from_name(image_path)
+    try:
+        date.fromisoformat(game_date)
+    except ValueError:
+        return MISSING_DATE_STR
+    return game_date
+
+
+def iter_results(screenshots, cache = None, workers = 1, max_pending = None, duplicates = None):
+    """
+    Yields (image_path, json_object, error) for every screenshot in order, analyzing lazily as the consumer pulls.
+    At most max_pending screenshots are queued or in flight at once, so a slow consumer holds back the workers
+    and memory stays flat however many screenshots the folder has.
+    @param screenshots: The (date, path) pairs returned by scan_screenshots.
+    @param cache: An optional ResultCache, hits skip analysis and new results are stored in it (save it when done).
+    @param workers: Number of worker processes, defaults to 1 which analyzes in the current process.
+    @param max_pending: Bound on the analysis queue, defaults to 4 per worker.
+    @param duplicates: An optional dedupe.DuplicateFilter, repeats of an image already kept for the same date are skipped before analysis.
+    """
+    if duplicates is not None:
+        screenshots = unique_screenshots(screenshots, duplicates)
+    return analyze_in_order(((image_path, None) for _, image_path in screenshots), cache, workers, max_pending)
+
+
+def iter_archive_results(archive_paths, cache = None, workers = 1, max_pending = None, duplicates = None):
+    """
+    Yields (member path, json_object, error) for every image in a list of zip or tar archives, in archive order.
+    Each archive is read once front to back and each member goes to the workers as bytes, nothing is extracted to disk.
+    Member paths look like "<archive path>::<member name>", the date comes from the member name.
+    Cached members are skipped without being decompressed (zip) or read (tar), unless they have to be hashed for duplicates.
+    @param archive_paths: The paths for the zip or tar archives, e.g. from list_archives. They share one worker pool.
+    @param cache: An optional ResultCache, hits skip analysis and new results are stored in it (save it when done).
+    @param workers: Number of worker processes, defaults to 1 which analyzes in the current process.
+    @param max_pending: Bound on the analysis queue, defaults to 4 per worker.
+    @param duplicates: An optional dedupe.DuplicateFilter, shared with iter_results so members and plain files are compared too.
+    """
+    members = (member for archive_path in archive_paths for member in archive_members(archive_path))
+    if duplicates is not None:
+        members = unique_members(members, duplicates)
+    return analyze_in_order(members, cache, workers, max_pending)
+
+
+def unique_screenshots(screenshots, duplicates):
+    """
+    Yields the (date, path) pairs whose image isn't a repeat of one already kept for the same date.
+    @param screenshots: (date, path) pairs, e.g. from scan_screenshots.
+    @param duplicates: A dedupe.DuplicateFilter.
+    """
+    for game_date, image_path in screenshots:
+        if duplicates.check(game_date, image_path) is None:
+            yield game_date, image_path
+
+
+def unique_members(members, duplicates):
+    """
+    Yields the (member path, read) pairs whose image isn't a repeat of one already kept for the same date.
+    @param members: (member path, read) pairs as yielded by archive_members.
+    @param duplicates: A dedupe.DuplicateFilter.
+    """
+    for image_path, read in members:
+        # The bytes hashed here are the ones analyzed, the member is only read (and decompressed) once
+        read = lru_cache(maxsize=1)(read)
+        if duplicates.check(screenshot_date(image_path), image_path, read) is None:
+            yield image_path, read
+
+
+def archive_members(archive_path):
+    """
+    Yields (member path, read) for every image member in archive order, where read() returns the member's bytes.
+    read() has to be called before the next member is pulled, tar archives are streamed and can't go back.
+    @param archive_path: The path for the zip or tar archive.
+    """
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                    yield archive_path + ARCHIVE_SEPARATOR + info.filename, partial(archive.read, info)
+        return
+
+    # Stream mode reads compressed tars in one sequential pass
+    with tarfile.open(archive_path, "r|*") as archive:
+        for member in archive:
+            if member.isfile() and member.name.lower().endswith(IMAGE_EXTENSIONS):
+                yield archive_path + ARCHIVE_SEPARATOR + member.name, partial(read_tar_member, archive, member)
+
+
+def read_tar_member(archive, member):
+    with archive.extractfile(member) as f:
+        return f.read()
+
+
+def analyze_in_order(items, cache = None, workers = 1, max_pending = None, timed = False):
+    """
+    The analysis pipeline shared by folders, archives, watch and team mode. Yields (image_path, json_object, error) in input order.
+    @param items: An iterable of (image_path, read) pairs, read is None to load the file from disk or a function returning the image bytes.
+    @param cache: An optional ResultCache.
+    @param workers: Number of worker processes, defaults to 1 which analyzes in the current process.
+    @param max_pending: Bound on the analysis queue, defaults to 4 per worker.
+    @param timed: True or False, adds the analysis seconds to every outcome as a fourth value, None for cache hits.
+    """
+    # Imported here so scanning and cached reads don't load OpenCV
+    from batch_analysis import analyze_screenshot, analyze_screenshot_bytes, timed_analysis
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    if max_pending is None:
+        max_pending = workers * 4
+
+    def lookup(image_path):
+        data = cache.get(image_path) if cache else None
+        if data is None:
+            return None
+        return (image_path, data, None, None) if timed else (image_path, data, None)
+
+    def store(outcome):
+        image_path, data, error = outcome[:3]
+        if cache and error is None:
+            cache.put(image_path, data)
+        return outcome
+
+    def task(image_path, read):
+        # Bytes are only read on a cache miss
+        if read is None:
+            analyze, args = analyze_screenshot, (image_path,)
+        else:
+            analyze, args = analyze_screenshot_bytes, (image_path, read())
+        return partial(timed_analysis, analyze, *args) if timed else partial(analyze, *args)
+
+    if workers == 1:
+        for image_path, read in items:
+            yield lookup(image_path) or store(task(image_path, read)())
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Cached results and futures share one queue so everything comes out in input order
+        pending = deque()
+        for image_path, read in items:
+            pending.append(lookup(image_path) or executor.submit(task(image_path, read)))
+            # Backpressure: wait for the oldest screenshot before queueing more
+            while len(pending) >= max_pending:
+                yield resolve(pending.popleft(), store)
+
+        while pending:
+            yield resolve(pending.popleft(), store)
+
+
+def resolve(item, store):
+    if isinstance(item, Future):
+        return store(item.result())
+    return item
+
+
+def latest_year(screenshots):
+    """
+    Returns the year of the newest dated screenshot, from the filenames alone, or None if none has a date.
+    @param screenshots: (date, path) pairs, e.g. as returned by scan_screenshots.
+    """
+    dated = [game_date for game_date, _ in screenshots if game_date != MISSING_DATE_STR]
+    return int(max(dated)[:4]) if dated else None
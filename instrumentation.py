@@ -0,0 +1,192 @@
+import json
+import threading
+import time
+from collections import defaultdict, deque
+
+# Raw spans kept for percentiles and per-label breakdowns, older ones are dropped so long-running modes (watch, serve) don't grow
+MAX_RECORDS = 100000
+
+# Instrumentation is off unless enable() is called, span() then returns a shared no-op object
+_enabled = False
+_records = deque(maxlen=MAX_RECORDS)
+# Exact [count, total, max] per span name over every span ever recorded, updated in place
+_totals = {}
+_callbacks = []
+_local = threading.local()
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record_span(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _Label:
+    __slots__ = ("label", "previous")
+
+    def __init__(self, label):
+        self.label = label
+
+    def __enter__(self):
+        self.previous = getattr(_local, "label", None)
+        _local.label = self.label
+        return self
+
+    def __exit__(self, *exc_info):
+        _local.label = self.previous
+        return False
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """
+    Drops every recorded span, callbacks stay registered.
+    """
+    _records.clear()
+    _totals.clear()
+
+
+def add_callback(callback):
+    """
+    Registers a hook called as callback(label, name, seconds) for every span as it finishes.
+    @param callback: A function taking (label, name, seconds).
+    """
+    _callbacks.append(callback)
+
+
+def remove_callback(callback):
+    _callbacks.remove(callback)
+
+
+def span(name):
+    """
+    Times a named stage. Usage: with span("adaptive_threshold"): ...
+    Costs one flag check when instrumentation is off.
+    @param name: The stage name.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def label(name):
+    """
+    Tags every span recorded inside the block with a label, e.g. the image path or render name, for per-image breakdowns.
+    Labels are per thread. Worker processes keep their own records, so analyze with workers=1 to instrument images.
+    @param name: The label.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Label(name)
+
+
+def record_span(name, seconds):
+    """
+    Records a finished span, for stages timed outside of span().
+    """
+    current_label = getattr(_local, "label", None)
+    _records.append((current_label, name, seconds))
+    totals = _totals.setdefault(name, [0, 0.0, 0.0])
+    totals[0] += 1
+    totals[1] += seconds
+    totals[2] = max(totals[2], seconds)
+    for callback in _callbacks:
+        callback(current_label, name, seconds)
+
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank percentile on an already sorted list
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def summary():
+    """
+    Returns {span name: {count, total, mean, p50, p90, p99, max}} with times in seconds.
+    count, total, mean and max cover every span, the percentiles only the last MAX_RECORDS spans.
+    """
+    durations = defaultdict(list)
+    for _, name, seconds in _records:
+        durations[name].append(seconds)
+
+    stats = {}
+    for name, (count, total, longest) in _totals.items():
+        values = sorted(durations[name])
+        stats[name] = {
+            "count": count,
+            "total": total,
+            "mean": total / count,
+            "p50": percentile(values, 0.5) if values else None,
+            "p90": percentile(values, 0.9) if values else None,
+            "p99": percentile(values, 0.99) if values else None,
+            "max": longest,
+        }
+    return stats
+
+
+def by_label(name = None):
+    """
+    Returns {label: total seconds} over the last MAX_RECORDS spans, optionally for a single span name. Useful for finding outlier screenshots.
+    @param name: Only count spans with this name, defaults to None (all spans).
+    """
+    totals = defaultdict(float)
+    for current_label, span_name, seconds in _records:
+        if name is None or span_name == name:
+            totals[current_label] += seconds
+    return dict(totals)
+
+
+def slowest(name, count = 5):
+    """
+    Returns the count slowest (label, seconds) pairs for a span name.
+    """
+    return sorted(by_label(name).items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+def export_json(path = None):
+    """
+    Returns the summary and the retained raw spans as a JSON string, and writes it to path when given.
+    @param path: A file path to write to, defaults to None.
+    """
+    exported = json.dumps({
+        "summary": summary(),
+        "spans": [{"label": current_label, "name": name, "seconds": seconds} for current_label, name, seconds in _records],
+    }, indent=2)
+
+    if path is not None:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(exported)
+    return exported
@@ -0,0 +1,167 @@
+import io
+from datetime import date, datetime
+
+from PIL import Image, ImageDraw
+
+from assets import new_canvas
+from calendar_draw import draw_calendar, draw_day, draw_panel_labels
+from calendar_layout import CalendarLayout
+from instrumentation import span, label
+from stats_draw import draw_infographics
+from stats_engine import StatsAccumulator
+
+
+def render_infographic(data, output = None, stats = None, image_format = "PNG", layout = None, today = None, trends = False):
+    """
+    Draws the calendar and the stats onto one in-memory copy of the template, with no intermediate files and no display.
+    Returns the encoded image as bytes when output is None, otherwise writes it to output and returns the path.
+    @param data: A GameStore, or a dictionary of NYT Connections data grouped by month as returned by game_data.group_by_month.
+    @param output: A path or writable file object to save to, defaults to None (return bytes).
+    @param stats: An optional StatsAccumulator already holding every game in data.
+    @param image_format: The PIL format to encode with, defaults to PNG.
+    @param layout: The CalendarLayout to draw, defaults to the calendar year of the most recent game.
+    @param today: The date missed days are counted up to, defaults to now.
+    @param trends: True or False, toggles the rolling trend panel below the stats.
+    """
+    image = draw_infographic_image(data, stats, layout, today, trends)
+    return encode_image(image, output, image_format)
+
+
+def draw_infographic_image(data, stats = None, layout = None, today = None, trends = False):
+    """
+    Returns the finished infographic as a PIL image.
+    @param data: A GameStore, or a dictionary of NYT Connections data grouped by month as returned by game_data.group_by_month.
+    @param stats: An optional StatsAccumulator already holding every game in data.
+    @param layout: The CalendarLayout to draw, defaults to the calendar year of the most recent game.
+    @param today: The date missed days are counted up to, defaults to now.
+    @param trends: True or False, toggles the rolling trend panel below the stats.
+    """
+    with span("render"):
+        with span("new_canvas"):
+            image = new_canvas()
+        with span("draw_calendar"):
+            draw_calendar(data, image, layout)
+        with span("draw_infographics"):
+            draw_infographics(data, stats, image, today)
+        if trends:
+            # The analytics need NumPy, so they are only imported when asked for
+            from trend_draw import draw_trend_panel
+            with span("draw_trend_panel"):
+                image = draw_trend_panel(image, data)
+    return image
+
+
+def draw_infographic_stream(games, layout, today = None, stats = None):
+    """
+    Returns the finished infographic for games that arrive one at a time, e.g. from ingest.iter_results.
+    Each game is drawn and added to the stats as it arrives and then dropped, so memory doesn't grow with the history.
+    @param games: An iterable of json objects in date order.
+    @param layout: The CalendarLayout to draw, it has to be known before the first game arrives.
+    @param today: The date missed days are counted up to, defaults to now.
+    @param stats: An optional empty StatsAccumulator to fill, so the caller can read the drawn statistics afterwards.
+    """
+    with span("render"):
+        with span("new_canvas"):
+            image = new_canvas()
+        draw = ImageDraw.Draw(image)
+        draw_panel_labels(draw, layout)
+
+        if stats is None:
+            stats = StatsAccumulator()
+        for data in games:
+            stats.add_game(data)
+            try:
+                day = date.fromisoformat(str(data['Date']))
+            except ValueError:
+                print("Date error on date: ", str(data['Date']))
+                continue
+            draw_day(draw, layout, day, data)
+
+        with span("draw_infographics"):
+            draw_infographics(None, stats, image, today)
+    return image
+
+
+def render_year_panels(data, output_pattern = None, image_format = "PNG"):
+    """
+    Renders one infographic per calendar year in the data, each with its own calendar panel and stats.
+    Returns a dictionary of {year: bytes}, or {year: path} when output_pattern is given.
+    @param data: A GameStore, or a dictionary of NYT Connections data grouped by month as returned by game_data.group_by_month.
+    @param output_pattern: A path containing {year}, e.g. "infographic_{year}.png". Defaults to None (return bytes).
+    @param image_format: The PIL format to encode with, defaults to PNG.
+    """
+    # Per-year slicing needs the date-sorted store, imported here so single renders never load NumPy
+    from game_store import GameStore
+
+    store = data if isinstance(data, GameStore) else GameStore.from_monthly_dict(data)
+    now = datetime.now()
+    years = sorted({date.fromordinal(int(ordinal)).year for ordinal in store.dates if ordinal <= date.max.toordinal()})
+
+    outputs = {}
+    for year in years:
+        year_store = store.between("{}-01-01".format(year), "{}-12-31".format(year))
+        # Past years count missed days over the whole year
+        today = now if year == now.year else datetime(year, 12, 31)
+        output = output_pattern.format(year=year) if output_pattern else None
+        with label("year {}".format(year)):
+            outputs[year] = render_infographic(year_store, output, image_format=image_format, layout=CalendarLayout.for_year(year), today=today)
+    return outputs
+
+
+def encode_image(image, output = None, image_format = "PNG", palette = False, compress_level = None, quality = None):
+    """
+    Encodes an image to bytes, or saves it when an output is given.
+    @param image: A PIL image.
+    @param output: A path or writable file object, defaults to None (return bytes).
+    @param image_format: The PIL format to encode with, defaults to PNG. WEBP is also supported.
+    @param palette: True or False, stores the image with a color palette when it has at most 256 colors (the infographic does), so nothing is lost.
+    @param compress_level: The PNG zlib level from 0 (fastest) to 9 (smallest), defaults to Pillow's 6.
+    @param quality: The WebP quality from 0 to 100, defaults to None (lossless WebP).
+    """
+    options = {}
+    if image_format.upper() == "PNG" and compress_level is not None:
+        options["compress_level"] = compress_level
+    elif image_format.upper() == "WEBP":
+        options["lossless"] = quality is None
+        if quality is not None:
+            options["quality"] = quality
+
+    with span("encode_" + image_format.lower()):
+        if palette:
+            image = to_exact_palette(image)
+
+        if output is None:
+            buffer = io.BytesIO()
+            image.save(buffer, format=image_format, **options)
+            return buffer.getvalue()
+
+        image.save(output, format=image_format, **options)
+        return output
+
+
+def to_exact_palette(image):
+    """
+    Returns the image as a palette ("P" mode) image holding exactly its own colors, or unchanged when it has more than 256 colors.
+    Quantizers like FASTOCTREE shift colors even when few enough exist, this never changes a pixel.
+    @param image: An RGB or RGBA PIL image, other modes are returned unchanged.
+    """
+    if image.mode not in ("RGB", "RGBA"):
+        return image
+    colors = image.getcolors(256)
+    if colors is None:
+        return image
+
+    import numpy as np
+
+    # Pack each pixel into one integer and look up its palette index, Pillow's own palette mapping rounds colors
+    palette = np.array(sorted(color for _, color in colors), dtype=np.uint64)
+    pixels = np.asarray(image, dtype=np.uint64)
+    keys = np.zeros(len(palette), dtype=np.uint64)
+    packed = np.zeros(pixels.shape[:2], dtype=np.uint64)
+    for channel in range(len(image.mode)):
+        keys = keys << np.uint64(8) | palette[:, channel]
+        packed = packed << np.uint64(8) | pixels[..., channel]
+
+    result = Image.fromarray(np.searchsorted(keys, packed).astype(np.uint8), "P")
+    result.putpalette(palette.astype(np.uint8).ravel().tolist(), image.mode)
+    return result
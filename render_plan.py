@@ -0,0 +1,183 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+from PIL import ImageDraw
+
+from assets import new_canvas
+from calendar_draw import draw_day, draw_panel_labels
+from calendar_layout import CalendarLayout, month_index
+from game_data import iter_games
+from instrumentation import span, label
+from render import encode_image
+from stats_draw import draw_infographics
+from stats_engine import StatsAccumulator
+
+VIEW_KINDS = ("year", "quarter", "month")
+FILE_EXTENSIONS = {"PNG": ".png", "WEBP": ".webp"}
+
+
+class View:
+    """
+    One infographic to render: a run of whole months drawn on their year's calendar, with stats for just those months.
+    Usage: View.year(2024), View.quarter(2024, 2), View.month(2024, 3)
+    """
+
+    def __init__(self, name, first_month, months, title = None):
+        """
+        @param name: A unique name, also used as the output filename.
+        @param first_month: A date in the first month of the view.
+        @param months: The number of months in the view, up to the end of first_month's year.
+        @param title: The title drawn instead of the year, defaults to None (the year).
+        """
+        self.name = name
+        self.first_month = date(first_month.year, first_month.month, 1)
+        self.months = months
+        self.title = title
+
+    @classmethod
+    def year(cls, year):
+        return cls(str(year), date(year, 1, 1), 12)
+
+    @classmethod
+    def quarter(cls, year, quarter):
+        return cls("{}-Q{}".format(year, quarter), date(year, quarter * 3 - 2, 1), 3, "Q{} {}".format(quarter, year))
+
+    @classmethod
+    def month(cls, year, month):
+        first_month = date(year, month, 1)
+        return cls(first_month.strftime("%Y-%m"), first_month, 1, first_month.strftime("%B %Y"))
+
+    def month_indexes(self):
+        first_index = month_index(self.first_month)
+        return range(first_index, first_index + self.months)
+
+    @property
+    def last_day(self):
+        # Day before the first month after the view
+        index = month_index(self.first_month) + self.months
+        return date.fromordinal(date(index // 12, index % 12 + 1, 1).toordinal() - 1)
+
+    def __repr__(self):
+        return "View({!r})".format(self.name)
+
+
+class MonthlyAggregates:
+    """
+    The games grouped by month, with one StatsAccumulator per month, built in a single pass.
+    The stats for any view are merged from its months, so no view ever walks the other games again.
+    """
+
+    def __init__(self, data):
+        """
+        @param data: A GameStore, or a dictionary of NYT Connections data grouped by month as returned by game_data.group_by_month.
+        """
+        # {month index: [(date, game), ...]} and {month index: StatsAccumulator}, both in date order
+        self.games = {}
+        self.stats = {}
+        for game in iter_games(data):
+            try:
+                day = date.fromisoformat(str(game['Date']))
+            except ValueError:
+                # Undated games can't be placed in any view
+                continue
+            index = month_index(day)
+            self.games.setdefault(index, []).append((day, game))
+            self.stats.setdefault(index, StatsAccumulator()).add_game(game)
+
+    def years(self):
+        return sorted({index // 12 for index in self.games})
+
+    def has_games(self, view):
+        return any(index in self.games for index in view.month_indexes())
+
+    def stats_for(self, view):
+        return StatsAccumulator.combine(self.stats[index] for index in view.month_indexes() if index in self.stats)
+
+
+def plan_views(aggregates, kinds = VIEW_KINDS):
+    """
+    Returns a view of every requested kind that holds at least one game, a year followed by its quarters and months.
+    @param aggregates: A MonthlyAggregates.
+    @param kinds: Any of "year", "quarter" and "month", defaults to all three.
+    """
+    views = []
+    for year in aggregates.years():
+        candidates = []
+        if "year" in kinds:
+            candidates.append(View.year(year))
+        if "quarter" in kinds:
+            candidates.extend(View.quarter(year, quarter) for quarter in range(1, 5))
+        if "month" in kinds:
+            candidates.extend(View.month(year, month) for month in range(1, 13))
+        views.extend(view for view in candidates if aggregates.has_games(view))
+    return views
+
+
+def draw_view(aggregates, view, today = None):
+    """
+    Returns the infographic for one view as a PIL image, drawn on a fresh copy of the in-memory template.
+    @param aggregates: A MonthlyAggregates.
+    @param view: A View.
+    @param today: The date missed days are counted up to, defaults to now. Views that already ended count up to their last day.
+    """
+    today = today or datetime.now()
+    image = new_canvas()
+    draw = ImageDraw.Draw(image)
+    layout = CalendarLayout.for_year(view.first_month.year)
+    draw_panel_labels(draw, layout, view.title)
+
+    for index in view.month_indexes():
+        for day, game in aggregates.games.get(index, ()):
+            draw_day(draw, layout, day, game)
+
+    # Missed days only count the days of the view itself
+    view_today = min(date(today.year, today.month, today.day), view.last_day)
+    return draw_infographics(None, aggregates.stats_for(view), image, view_today, view.first_month)
+
+
+def render_views(data, views = None, output_dir = None, image_format = "PNG", palette = False, compress_level = None, quality = None, workers = None, today = None):
+    """
+    Renders many infographics from one dataset. The games are grouped once, each view is drawn in turn,
+    and the finished images are encoded on a thread pool while the next ones are drawn.
+    Returns a dictionary of {view name: bytes}, or {view name: path} when output_dir is given, in view order.
+    @param data: A MonthlyAggregates, a GameStore, or a dictionary of NYT Connections data grouped by month as returned by game_data.group_by_month.
+    @param views: A list of View, defaults to every year, quarter and month with games.
+    @param output_dir: The folder to write <view name>.png (or .webp) to, defaults to None (return bytes).
+    @param image_format: The PIL format to encode with, defaults to PNG. WEBP is also supported.
+    @param palette: True or False, stores the images with an exact color palette when they have at most 256 colors.
+    @param compress_level: The PNG zlib level from 0 to 9, defaults to Pillow's 6.
+    @param quality: The WebP quality from 0 to 100, defaults to None (lossless WebP).
+    @param workers: Encoder threads, defaults to one per CPU.
+    @param today: The date missed days are counted up to, defaults to now.
+    """
+    aggregates = data if isinstance(data, MonthlyAggregates) else MonthlyAggregates(data)
+    if views is None:
+        views = plan_views(aggregates)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    extension = FILE_EXTENSIONS.get(image_format.upper(), "." + image_format.lower())
+
+    outputs = {}
+    # Drawing stays on this thread (PIL fonts aren't shared across threads safely), encoding releases the GIL so it runs in parallel
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for view in views:
+            with label(view.name), span("draw_view"):
+                image = draw_view(aggregates, view, today)
+            output = os.path.join(output_dir, view.name + extension) if output_dir else None
+            pending.append((view.name, executor.submit(encode_image, image, output, image_format, palette, compress_level, quality)))
+            # Backpressure: at most two finished images per encoder are held in memory
+            while len(pending) >= workers * 2:
+                name, future = pending.popleft()
+                outputs[name] = future.result()
+
+        while pending:
+            name, future = pending.popleft()
+            outputs[name] = future.result()
+    return outputs
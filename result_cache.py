@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+
+from detector_settings import DETECTOR_VERSION, DEFAULT_COLOR_THRESHOLDS
+from game_data import ARCHIVE_SEPARATOR
+
+# Bump whenever the layout of the cache file itself changes
+CACHE_FORMAT_VERSION = 1
+DEFAULT_CACHE_PATH = ".connections_cache.json"
+
+
+def detector_fingerprint(color_thresholds = 0):
+    """
+    Returns a short hash identifying the detector version and color thresholds used to produce a result.
+    Any change to either one produces a new fingerprint, which invalidates the whole cache.
+    @param color_thresholds: A dictionary of color thresholds as used by color_categorizer, defaults to the NYT Connections values.
+    """
+    if color_thresholds == 0:
+        color_thresholds = DEFAULT_COLOR_THRESHOLDS
+
+    payload = json.dumps({"detector": DETECTOR_VERSION, "thresholds": color_thresholds}, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def file_signature(image_path):
+    """
+    Returns the (size, mtime) signature of a file, used to detect new or changed screenshots without reading them.
+    Screenshots inside an archive share the archive's signature, so a changed archive is analyzed again.
+    @param image_path: The path for the file to check.
+    """
+    stat = os.stat(image_path.partition(ARCHIVE_SEPARATOR)[0])
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def cache_key(image_path):
+    """
+    Returns the absolute path used as the cache key, only the archive part of an archive member's name is made absolute.
+    @param image_path: The path for the screenshot.
+    """
+    archive_path, separator, member = image_path.partition(ARCHIVE_SEPARATOR)
+    return os.path.abspath(archive_path) + separator + member
+
+
+class ResultCache:
+    """
+    On-disk cache of find_rectangles results, keyed on (path, size, mtime) plus the detector fingerprint.
+    Usage: cache = ResultCache(); data = cache.get(path); ...; cache.put(path, data); cache.save()
+    """
+
+    def __init__(self, cache_path = DEFAULT_CACHE_PATH, fingerprint = None):
+        self.cache_path = cache_path
+        self.fingerprint = fingerprint if fingerprint is not None else detector_fingerprint()
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def load(self):
+        # Start from an empty cache if the file is missing, unreadable, or was built by another detector
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if stored.get("format") != CACHE_FORMAT_VERSION or stored.get("fingerprint") != self.fingerprint:
+            return
+
+        self.entries = stored.get("entries", {})
+
+    def get(self, image_path):
+        """
+        Returns the cached result for an image, or None if the image is new or has changed since it was cached.
+        @param image_path: The path for the image to look up.
+        """
+        key = cache_key(image_path)
+        entry = self.entries.get(key)
+
+        try:
+            signature = file_signature(image_path)
+        except OSError:
+            signature = None
+
+        if entry is None or signature is None or entry["signature"] != signature:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return restore_result(entry["result"])
+
+    def put(self, image_path, result):
+        """
+        Stores the result for an image, replacing any older entry for the same path.
+        @param image_path: The path for the analyzed image.
+        @param result: The json object returned by find_rectangles.
+        """
+        key = cache_key(image_path)
+        self.entries[key] = {"signature": file_signature(image_path), "result": result}
+
+    def archive_results(self, archive_path):
+        """
+        Returns (member path, result) for every cached member of an unchanged archive, in the order they were analyzed.
+        The archive itself is never opened, so renders from an archive cost no decompression.
+        @param archive_path: The path for the zip or tar archive.
+        """
+        prefix = cache_key(archive_path) + ARCHIVE_SEPARATOR
+        try:
+            signature = file_signature(archive_path)
+        except OSError:
+            return []
+        return [(key, restore_result(entry["result"])) for key, entry in self.entries.items()
+                if key.startswith(prefix) and entry["signature"] == signature]
+
+    def evict_stale(self):
+        """
+        Removes entries whose files no longer exist or have changed since they were cached. Returns the number removed.
+        """
+        stale = []
+        for key, entry in self.entries.items():
+            try:
+                if file_signature(key) != entry["signature"]:
+                    stale.append(key)
+            except OSError:
+                stale.append(key)
+
+        for key in stale:
+            del self.entries[key]
+        return len(stale)
+
+    def save(self):
+        # Drop stale entries, then write to a temp file and swap it in so a crash never leaves a half-written cache
+        self.evict_stale()
+        stored = {"format": CACHE_FORMAT_VERSION, "fingerprint": self.fingerprint, "entries": self.entries}
+
+        temp_path = self.cache_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(stored, f)
+        os.replace(temp_path, self.cache_path)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
+
+
+def restore_result(result):
+    """
+    JSON turns the integer guess numbers in 'Data' into strings, convert them back so cached results match fresh ones.
+    @param result: A json object as stored in the cache.
+    """
+    restored = dict(result)
+    restored['Data'] = {int(index): color for index, color in result['Data'].items()}
+    return restored
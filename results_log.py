@@ -0,0 +1,141 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+from game_store import GameStore, GAME_DTYPE, MAX_GUESSES, COLOR_CODES, NO_GUESS, date_to_ordinal
+from result_cache import restore_result
+
+# File layout: a 16 byte header, then fixed-size little-endian records with no separators
+LOG_MAGIC = b"NYTCLOG\0"
+LOG_SCHEMA_VERSION = 1
+HEADER = struct.Struct("<8sHHI")
+# date ordinal (int32), won (bool), guess count (int8), one int8 color code per guess
+RECORD = struct.Struct("<i?b{}b".format(MAX_GUESSES))
+# The same record as a NumPy dtype, so the file can be memory-mapped straight into a GameStore-compatible array
+LOG_DTYPE = np.dtype([
+    ("date", "<i4"),
+    ("won", "?"),
+    ("guesses", "i1"),
+    ("colors", "i1", (MAX_GUESSES,)),
+])
+assert LOG_DTYPE.itemsize == RECORD.size == GAME_DTYPE.itemsize
+
+
+def pack_game(game):
+    """
+    Packs one json object as returned by find_rectangles into a log record.
+    @param game: A json object.
+    """
+    colors = [NO_GUESS] * MAX_GUESSES
+    for guess_number, color in game['Data'].items():
+        if 1 <= int(guess_number) <= MAX_GUESSES:
+            colors[int(guess_number) - 1] = COLOR_CODES.get(color, COLOR_CODES["Unknown color"])
+    return RECORD.pack(date_to_ordinal(game['Date']), game['Result'] == "Won", game['Guesses'], *colors)
+
+
+def read_header(f):
+    """
+    Reads and validates the header, raising ValueError for files that aren't a results log of this schema.
+    """
+    raw = f.read(HEADER.size)
+    if len(raw) < HEADER.size:
+        raise ValueError("Results log is missing its header")
+    magic, version, record_size, _ = HEADER.unpack(raw)
+    if magic != LOG_MAGIC:
+        raise ValueError("Not a results log")
+    if version != LOG_SCHEMA_VERSION or record_size != RECORD.size:
+        raise ValueError("Results log schema {} with {} byte records is not supported (expected {} with {})".format(
+            version, record_size, LOG_SCHEMA_VERSION, RECORD.size))
+
+
+class ResultsLog:
+    """
+    Append-only binary log of games, one fixed-size record per game after a versioned header.
+    Appends are flushed and fsynced, and a record torn by a crash is ignored by readers and cut off before the next append,
+    so the log is always a valid prefix of what was written.
+    Usage: log = ResultsLog("games.log", create=True); log.extend(results); store = ResultsLog("games.log").store()
+    """
+
+    def __init__(self, log_path, create = False):
+        """
+        @param log_path: The log file.
+        @param create: True or False, starts an empty log when the file is missing. Readers leave it off so a wrong path raises FileNotFoundError.
+        """
+        self.log_path = log_path
+        if create and not os.path.exists(log_path):
+            self.create(log_path)
+        with open(log_path, "rb") as f:
+            read_header(f)
+
+    @staticmethod
+    def create(log_path, games = ()):
+        """
+        Writes a new log holding the given games, replacing any existing file in one atomic rename.
+        @param log_path: The log file to write.
+        @param games: An iterable of json objects.
+        """
+        temp_path = log_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(HEADER.pack(LOG_MAGIC, LOG_SCHEMA_VERSION, RECORD.size, 0))
+            f.write(b"".join(pack_game(game) for game in games))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, log_path)
+
+    def __len__(self):
+        return max(0, os.path.getsize(self.log_path) - HEADER.size) // RECORD.size
+
+    def append(self, game):
+        self.extend([game])
+
+    def extend(self, games):
+        """
+        Appends games as a single write, then flushes them to disk.
+        @param games: An iterable of json objects.
+        """
+        data = b"".join(pack_game(game) for game in games)
+        if not data:
+            return
+        with open(self.log_path, "r+b") as f:
+            # A crash mid-append can leave a partial record, drop it so new records stay aligned
+            size = f.seek(0, os.SEEK_END)
+            complete = HEADER.size + (size - HEADER.size) // RECORD.size * RECORD.size
+            if complete != size:
+                f.truncate(complete)
+            f.seek(complete)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def records(self):
+        """
+        Returns every complete record as a read-only array memory-mapped from the file, in append order. No parsing happens.
+        """
+        count = len(self)
+        if count == 0:
+            return np.zeros(0, dtype=LOG_DTYPE)
+        return np.memmap(self.log_path, dtype=LOG_DTYPE, mode="r", offset=HEADER.size, shape=(count,))
+
+    def store(self):
+        """
+        Returns the games as a GameStore (sorted by date), ready for draw_calendar, draw_infographics and StatsAccumulator.
+        """
+        return GameStore(self.records())
+
+    def export_json(self, json_path):
+        """
+        Writes every game as a json list of objects in the find_rectangles format, in date order.
+        """
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(self.store().to_results(), f, indent=2)
+
+    def import_json(self, json_path):
+        """
+        Appends every game from a json list of objects in the find_rectangles format. Returns the number of games added.
+        """
+        with open(json_path, "r", encoding="utf-8") as f:
+            games = [restore_result(game) for game in json.load(f)]
+        self.extend(games)
+        return len(games)
@@ -1,72 +1,69 @@
 import cv2
 import numpy as np
-import re
+from functools import lru_cache
 
-def find_rectangles(image_path, diags=False):
+from instrumentation import span, label
+from detector_settings import DEFAULT_COLOR_THRESHOLDS
+from game_data import date_from_name
+
+def find_rectangles(image_path, diags=False, color_thresholds=0):
     """
     Reads an image to find the rectangles representing NYT Connection Results.
     @param image_path: The path for the image to analyze.
     @pamar diags: True or False, toggles display showing the rectangles found and requires manual input. Not recommended for batch runs, defaults to False.
+    @param color_thresholds: A dictionary of color thresholds as used by color_categorizer, defaults to the NYT Connections values.
     """
     # Validate diags argument
     if diags not in [True, False]:
         raise ValueError("diags argument must be either True or False (leave blank to default to False)")
 
-    image = cv2.imread(image_path)
-    rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-
-    # Convert to grayscale and apply blurring
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-
-    # Adaptive thresholding to handle uneven lighting
-    thresh = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 11, 2)
+    # Stage timings are recorded per image when instrumentation is enabled
+    with label(image_path), span("find_rectangles"):
+        with span("imread"):
+            image = cv2.imread(image_path)
+        if image is None:
+            raise ValueError("Could not read image")
+        return analyze_image(image, image_path, diags, color_thresholds)
 
-    # Find contours
-    cnts = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0]
+def find_rectangles_in_bytes(image_bytes, image_name, diags=False, color_thresholds=0):
+    """
+    Decodes an encoded image held in memory, e.g. a member read from a zip or tar archive, and returns the same json object as find_rectangles.
+    @param image_bytes: The encoded image (PNG, JPEG, ...) as bytes.
+    @param image_name: The filename the date is read from, in YYYY-MM-DD format somewhere in the name.
+    @param diags: True or False, toggles display showing the rectangles found, defaults to False.
+    @param color_thresholds: A dictionary of color thresholds as used by color_categorizer, defaults to the NYT Connections values.
+    """
+    with label(image_name), span("find_rectangles"):
+        with span("imdecode"):
+            image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Could not decode image")
+        return analyze_image(image, image_name, diags, color_thresholds)
+
+def analyze_image(image, image_name, diags=False, color_thresholds=0):
+    """
+    Finds the NYT Connection Results in an already decoded image and returns the same json object as find_rectangles.
+    @param image: A BGR image as returned by cv2.imread.
+    @param image_name: The filename the date is read from, in YYYY-MM-DD format somewhere in the name.
+    @param diags: True or False, toggles display showing the rectangles found, defaults to False.
+    @param color_thresholds: A dictionary of color thresholds as used by color_categorizer, defaults to the NYT Connections values.
+    """
+    # Find the bounding rectangle of every result row
+    row_rectangles = find_row_rectangles(image, diags)
 
-    # Initialize lists to store rectangles and their colors
+    # Initialize list to store rectangles
     rectangles = []
-    rectangles_with_colors = []
 
-    # Loop over contours
-    for c in cnts:
-        peri = cv2.arcLength(c, True)
-        approx = cv2.approxPolyDP(c, 0.01 * peri, True) # can modify value if needed
+    # Each row holds 4 equally sized tiles
+    for (x, y, w, h) in row_rectangles:
+        for i in range(4):
+            rectangles.append((int(x + ((w * i)/4)), y, int(w/4), h))
 
-        ##  Optional visualization of polygons pre-filtering
-        if diags:
-            clone = image.copy()
-            cv2.drawContours(clone, [approx], -1, (0, 255, 0), 2)
-            cv2.imshow("Approximated Polygon", clone)
-            cv2.waitKey(0)
-            cv2.destroyAllWindows()
-
-        # Filter based on points to limit to rectangles
-        if cv2.isContourConvex(approx) and len(approx) == 4:
-            # Get bounding rectangle
-            x, y, w, h = cv2.boundingRect(approx)
-      
-            for i in range(4):
-                rectangles.append((int(x + ((w * i)/4)), y, int(w/4), h))
-
-    # Get the ROI of rectangles and return the RGB value
-    for (x, y, w, h) in rectangles:
-        cv2.rectangle(image, (x, y), (x + w, y + h), (0, 255, 0), 2)
-
-        # Extract region of interest
-        roi = rgb_image[y:y+h, x:x+w]
-
-        # Calculate average RGB values
-        avg_r = np.average(roi[:,:,0])
-        avg_g = np.average(roi[:,:,1])
-        avg_b = np.average(roi[:,:,2])
-
-        avg_color = (int(avg_r), int(avg_g), int(avg_b))
-        avg_color_name = color_categorizer(avg_color)
-
-        #rectangles_with_colors.append((x, y, w, h, avg_color_name))
-        rectangles_with_colors.append((avg_color_name))
+    # Average every tile in one pass and name the colors all at once
+    with span("tile_average_colors"):
+        avg_colors = tile_average_colors(image, rectangles)
+    with span("classify_colors"):
+        rectangles_with_colors = classify_colors(avg_colors, color_thresholds)
 
     # Image is read bottom-up, reverse for chronological order
     rectangles_with_colors.reverse()
@@ -92,16 +89,8 @@ def find_rectangles(image_path, diags=False):
     else:
         result = "Lost"
 
-    # Use regular expressions to extract date from image_path - looking for YYYY-MM-DD
-    date_pattern = r"\b\d{4}-\d{2}-\d{2}\b"
-    match = re.search(date_pattern, image_path)
-
-    if match:
-        # Use date in json object if it's available
-        image_date = match.group(0)
-    else:
-        # Fine to still run without a date, just use outlier value to highlight issue
-        image_date = "9999-99-99"
+    # The date comes from image_name, looking for YYYY-MM-DD
+    image_date = date_from_name(image_name)
 
     json_object = {
         'Date': image_date,
@@ -112,11 +101,128 @@ def find_rectangles(image_path, diags=False):
 
     # Optionally show the image with identified rectangles
     if diags:
+        for (x, y, w, h) in rectangles:
+            cv2.rectangle(image, (x, y), (x + w, y + h), (0, 255, 0), 2)
         cv2.imshow("Image", image)
         cv2.waitKey(0)
 
     return json_object
 
+def find_row_rectangles(image, diags=False):
+    """
+    Finds the bounding rectangles of the result rows in an image, in the order findContours returns them (bottom-up).
+    @param image: A BGR image as returned by cv2.imread.
+    @param diags: True or False, toggles display of every polygon found before filtering, defaults to False.
+    """
+    # Convert to grayscale and apply blurring
+    with span("grayscale_blur"):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+
+    # Adaptive thresholding to handle uneven lighting
+    with span("adaptive_threshold"):
+        thresh = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 11, 2)
+
+    # Find contours
+    with span("find_contours"):
+        cnts = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0]
+
+    with span("approx_polygons"):
+        return filter_row_contours(image, cnts, diags)
+
+def filter_row_contours(image, cnts, diags=False):
+    """
+    Keeps the contours that approximate to a convex 4-point polygon and returns their bounding rectangles.
+    @param image: The BGR image the contours were found in, only used for diags.
+    @param cnts: Contours as returned by cv2.findContours.
+    @param diags: True or False, toggles display of every polygon found before filtering, defaults to False.
+    """
+    row_rectangles = []
+
+    # Loop over contours
+    for c in cnts:
+        peri = cv2.arcLength(c, True)
+        approx = cv2.approxPolyDP(c, 0.01 * peri, True) # can modify value if needed
+
+        ##  Optional visualization of polygons pre-filtering
+        if diags:
+            clone = image.copy()
+            cv2.drawContours(clone, [approx], -1, (0, 255, 0), 2)
+            cv2.imshow("Approximated Polygon", clone)
+            cv2.waitKey(0)
+            cv2.destroyAllWindows()
+
+        # Filter based on points to limit to rectangles
+        if cv2.isContourConvex(approx) and len(approx) == 4:
+            # Get bounding rectangle
+            row_rectangles.append(cv2.boundingRect(approx))
+
+    return row_rectangles
+
+def tile_average_colors(image, rectangles):
+    """
+    Returns the average RGB value of every rectangle as an (N, 3) integer array, truncated like int(np.average(...)).
+    Uses an integral image so each tile costs four lookups no matter its size.
+    @param image: A BGR image as returned by cv2.imread.
+    @param rectangles: A list of (x, y, w, h) tuples.
+    """
+    if not rectangles:
+        return np.zeros((0, 3), dtype=np.int64)
+
+    # Float64 sums of uint8 pixels are exact, so the means match np.average bit for bit
+    integral = cv2.integral(image, sdepth=cv2.CV_64F)
+    height, width = image.shape[:2]
+
+    # Clip to the image the same way numpy slicing would
+    rects = np.array(rectangles, dtype=np.int64)
+    x1 = np.clip(rects[:, 0], 0, width)
+    y1 = np.clip(rects[:, 1], 0, height)
+    x2 = np.clip(rects[:, 0] + rects[:, 2], 0, width)
+    y2 = np.clip(rects[:, 1] + rects[:, 3], 0, height)
+
+    sums = integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+    area = ((x2 - x1) * (y2 - y1)).astype(np.float64)
+
+    # Empty tiles have no average, flag them with -1 so they never match a threshold
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = sums / area[:, None]
+    avg_colors = np.where(area[:, None] > 0, np.floor(means), -1).astype(np.int64)
+
+    # BGR to RGB
+    return avg_colors[:, ::-1]
+
+@lru_cache(maxsize=16)
+def threshold_arrays(threshold_items):
+    """
+    Converts color thresholds into arrays of names, lower bounds, and upper bounds for classify_colors. Cached per threshold set.
+    @param threshold_items: A tuple of (name, (lower, upper)) pairs, in the same order as the thresholds dictionary.
+    """
+    names = np.array([name for name, _ in threshold_items] + ["UNKNOWN COLOR"])
+    lower = np.array([bounds[0] for _, bounds in threshold_items], dtype=np.int64).reshape(-1, 3)
+    upper = np.array([bounds[1] for _, bounds in threshold_items], dtype=np.int64).reshape(-1, 3)
+    return names, lower, upper
+
+def classify_colors(colors, color_thresholds = 0):
+    """
+    Vectorized color_categorizer, categorizes many colors at once and returns a list of color names.
+    Thresholds are checked in dictionary order and the first match wins, exactly like color_categorizer.
+    @param colors: An (N, 3) array or list of RGB tuples.
+    @param color_thresholds: A dictionary of color names and their threshold RGB values in the structure of {"name": (R_l, G_l, B_l), (R_u, G_u, B_u)}
+    """
+    # Set default color threshold values based on NYT Connections colors
+    if color_thresholds == 0:
+        color_thresholds = DEFAULT_COLOR_THRESHOLDS
+
+    names, lower, upper = threshold_arrays(tuple((name, tuple(map(tuple, bounds))) for name, bounds in color_thresholds.items()))
+    colors = np.asarray(colors, dtype=np.int64).reshape(-1, 3)
+
+    # (N, K) table of which threshold box each color falls in
+    matches = np.all((colors[:, None, :] >= lower[None, :, :]) & (colors[:, None, :] <= upper[None, :, :]), axis=2)
+
+    # First matching threshold, or the outlier value in the last slot when none match
+    first_match = np.where(matches.any(axis=1), matches.argmax(axis=1), len(names) - 1)
+    return names[first_match].tolist()
+
 def color_categorizer(color, color_thresholds = 0):
     """
     Categorizes a color based on its RGB values.
@@ -125,17 +231,7 @@ def color_categorizer(color, color_thresholds = 0):
     """
     # Set default color threshold values based on NYT Connections colors
     if color_thresholds == 0:
-        # default NYT connections color values
-        # green = (160,195,90)
-        # yellow = (249,223,109)
-        # blue = (176,196,239)
-        # purple = (186,129,197)
-        color_thresholds = {
-            "green": ((140, 180, 70), (180, 210, 110)),
-            "yellow": ((230, 200, 80), (255, 230, 130)),
-            "blue": ((150, 170, 220), (185, 205, 250)),
-            "purple": ((170, 110, 180), (195, 140, 210)),
-        }
+        color_thresholds = DEFAULT_COLOR_THRESHOLDS
     
     # Loop through our thresholds to see if testing color is within range of any
     for color_name, thresholds in color_thresholds.items():
@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from dedupe import DEFAULT_HASH_INDEX_PATH
+from game_data import group_by_month
+from render import draw_infographic_image, encode_image
+from result_cache import DEFAULT_CACHE_PATH, detector_fingerprint
+from stats_engine import StatsAccumulator
+from watch import scan_folder
+
+DEFAULT_PORT = 8000
+# Rendered variants kept in memory, a variant is one (data version, day, options) tuple
+DEFAULT_MAX_RENDERS = 16
+
+
+def folder_version(folder_path):
+    """
+    Returns a short hash of the folder's file names, sizes and mtimes plus the detector fingerprint.
+    It changes whenever a screenshot or archive is added, changed, or removed, and costs one directory scan.
+    @param folder_path: The folder holding the screenshots and archives, or a single archive.
+    """
+    digest = hashlib.sha1(detector_fingerprint().encode("utf-8"))
+    # The same snapshot watch mode polls, which also handles a single archive in place of the folder
+    for path, (size, mtime) in sorted(scan_folder(folder_path).items()):
+        digest.update("{}\0{}\0{}\n".format(os.path.basename(path), size, mtime).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class RenderCache:
+    """
+    Thread-safe LRU of rendered bytes that also coalesces concurrent requests: while one thread
+    renders a key, every other request for that key waits on the same Future instead of rendering again.
+    """
+
+    def __init__(self, max_entries = DEFAULT_MAX_RENDERS):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.renders = 0
+
+    def get(self, key, render):
+        """
+        Returns the bytes for key, calling render() at most once no matter how many threads ask at the same time.
+        @param key: A hashable cache key.
+        @param render: A function taking no arguments and returning bytes.
+        """
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self.in_flight[key] = Future()
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = render()
+        except Exception as e:
+            with self.lock:
+                del self.in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            self.renders += 1
+            self.entries[key] = value
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            del self.in_flight[key]
+        future.set_result(value)
+        return value
+
+
+class InfographicService:
+    """
+    Holds the analyzed results for a screenshot folder and serves renders and stats for them.
+    A background thread re-checks the folder every refresh_interval seconds and analyzes new screenshots,
+    requests always see one consistent (version, results) snapshot and are never blocked by the refresh.
+    """
+
+    def __init__(self, folder_path = "NYT_Connections", cache_path = DEFAULT_CACHE_PATH, refresh_interval = 5.0, max_renders = DEFAULT_MAX_RENDERS,
+                 hash_index_path = DEFAULT_HASH_INDEX_PATH):
+        self.folder_path = folder_path
+        self.cache_path = cache_path
+        # None serves duplicate screenshots too, like --keep-duplicates everywhere else
+        self.hash_index_path = hash_index_path
+        self.refresh_interval = refresh_interval
+        self.renders = RenderCache(max_renders)
+        # PIL fonts aren't shared across threads safely, and drawing holds the GIL anyway, so renders run one at a time
+        self.draw_lock = threading.Lock()
+        self.snapshot = (None, [])
+        self.stopped = threading.Event()
+        self.refresh()
+
+    @property
+    def version(self):
+        return self.snapshot[0]
+
+    def render_key(self, version, *variant):
+        """
+        Returns the cache key (and ETag source) for a variant of the given data version.
+        Renders also depend on the date (missed days, the calendar year), so every new day is a new key.
+        """
+        return (version, date.today().isoformat()) + variant
+
+    def refresh(self):
+        """
+        Re-analyzes the folder if it changed since the last refresh. Returns True when the data changed.
+        """
+        version = folder_version(self.folder_path)
+        if version == self.snapshot[0]:
+            return False
+
+        # Imported here so the server only loads OpenCV once there is something to analyze
+        from generate import analyze_folder
+
+        results = analyze_folder(self.folder_path, self.cache_path, hash_index_path=self.hash_index_path)
+        # Swapping the tuple in one assignment lets request threads read it without a lock
+        self.snapshot = (version, results)
+        return True
+
+    def start(self):
+        thread = threading.Thread(target=self.refresh_loop, name="refresh", daemon=True)
+        thread.start()
+        return thread
+
+    def refresh_loop(self):
+        while not self.stopped.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print("Refresh failed -", e)
+
+    def infographic(self, trends = False):
+        """
+        Returns (etag, png bytes) for the current data.
+        @param trends: True or False, toggles the trend panel.
+        """
+        version, results = self.snapshot
+        key = self.render_key(version, "infographic", trends)
+
+        def render():
+            with self.draw_lock:
+                image = draw_infographic_image(group_by_month(results), trends=trends)
+                return encode_image(image)
+
+        return etag_for(key), self.renders.get(key, render)
+
+    def stats(self):
+        """
+        Returns (etag, json bytes) with the same values as get_aggregate_data and get_average_positions.
+        """
+        version, results = self.snapshot
+        key = self.render_key(version, "stats")
+
+        def render():
+            summary = StatsAccumulator.from_data(group_by_month(results)).to_json()
+            summary["version"] = version
+            return json.dumps(summary, indent=2).encode("utf-8")
+
+        return etag_for(key), self.renders.get(key, render)
+
+
+def etag_for(key):
+    return '"{}"'.format("-".join(str(part) for part in key))
+
+
+class InfographicHandler(BaseHTTPRequestHandler):
+    # Keep-alive connections, which needs a Content-Length on every response
+    protocol_version = "HTTP/1.1"
+    service = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+
+        if url.path in ("/", "/infographic.png"):
+            trends = query.get("trends", ["0"])[0] in ("1", "true")
+            self.respond_cached(lambda: self.service.infographic(trends), etag_for(self.service.render_key(self.service.version, "infographic", trends)), "image/png")
+        elif url.path == "/stats.json":
+            self.respond_cached(self.service.stats, etag_for(self.service.render_key(self.service.version, "stats")), "application/json")
+        else:
+            self.respond(404, b"Not found\n", "text/plain")
+
+    def respond_cached(self, produce, expected_etag, content_type):
+        # ETags come from the data version and the day, so a matching client gets a 304 without anything being rendered
+        if expected_etag in self.headers.get("If-None-Match", ""):
+            self.respond(304, b"", content_type, expected_etag)
+            return
+
+        try:
+            etag, body = produce()
+        except Exception as e:
+            self.respond(500, "Render failed: {}\n".format(e).encode("utf-8"), "text/plain")
+            return
+        self.respond(200, body, content_type, etag)
+
+    def respond(self, status, body, content_type, etag = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+            # Always revalidate, the ETag makes that a cheap 304
+            self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Per-request logging would dominate at hundreds of requests per second
+        pass
+
+
+def make_server(service, host = "127.0.0.1", port = DEFAULT_PORT):
+    """
+    Returns a ThreadingHTTPServer serving /infographic.png (add ?trends=1 for the trend panel) and /stats.json.
+    @param service: An InfographicService.
+    """
+    handler = type("BoundInfographicHandler", (InfographicHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(folder_path = "NYT_Connections", cache_path = DEFAULT_CACHE_PATH, host = "127.0.0.1", port = DEFAULT_PORT, refresh_interval = 5.0,
+          hash_index_path = DEFAULT_HASH_INDEX_PATH):
+    service = InfographicService(folder_path, cache_path, refresh_interval, hash_index_path=hash_index_path)
+    service.start()
+    server = make_server(service, host, port)
+    print("Serving http://{}:{}/infographic.png and /stats.json".format(host, server.server_address[1]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stopped.set()
+        server.server_close()
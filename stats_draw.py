@@ -1,21 +1,33 @@
-from PIL import Image, ImageDraw, ImageFont
-from calendar_draw import *
-from screenshot_processing import *
-import os; from os import listdir
-from datetime import datetime
-from collections import defaultdict
-
-def draw_infographics(dict):
-    # Process dictionary to get all desired data
-    total_games, longest_streak, streak_start_date, streak_end_date, average_attempts, missed_games = get_aggregate_data(dict)
-    average_guesses = get_average_positions(dict)
-
-    image = Image.open("infographic.png")
+from PIL import ImageDraw
+from assets import new_canvas, get_font, load_template
+from calendar_draw import get_bounds
+from stats_engine import StatsAccumulator
+
+# Everything draw_infographics paints, from the summary line down to the relative placement counts
+STATS_BOX = (0, 1205, 1000, 1480)
+
+def draw_infographics(dict, stats = None, image = None, today = None, first_day = None):
+    """
+    Draws the summary statistics onto the image and returns it.
+    @param dict: A GameStore, or a dictionary of NYT Connections data grouped by month as returned by game_data.group_by_month.
+    @param stats: An optional StatsAccumulator already holding every game in dict.
+    @param image: The PIL image to draw on, normally the one returned by draw_calendar. Defaults to a fresh copy of the template.
+    @param today: The date missed days are counted up to, defaults to now.
+    @param first_day: An optional date missed days are counted from, defaults to January 1st of today's year.
+    """
+    # Process dictionary to get all desired data in a single pass, unless an up to date accumulator was passed in
+    if stats is None:
+        stats = StatsAccumulator.from_data(dict)
+    total_games, longest_streak, streak_start_date, streak_end_date, average_attempts, missed_games = stats.aggregate_data(today, first_day)
+    average_guesses = stats.average_positions()
+
+    if image is None:
+        image = new_canvas()
     draw = ImageDraw.Draw(image)
 
     font_size = 25
     font_color = (202,202,202)
-    font = ImageFont.truetype("Roboto-Regular.ttf", font_size)
+    font = get_font("Roboto-Regular.ttf", font_size)
 
     # Coordinates for stats are hard-coded
     draw.text((154,1215), str(total_games), fill=font_color, font=font)
@@ -40,7 +52,7 @@ def draw_infographics(dict):
     # Collect relative guess data
     relative_color_data = {}
     for color in colors:
-        relative_color_data[color] = get_color_stats(dict, color)
+        relative_color_data[color] = stats.color_stats(color)
     
     for index, color in enumerate(colors):
         # Get bounds and draw rectangle
@@ -68,8 +80,19 @@ def draw_infographics(dict):
         relative_count_x += relative_count_delta
         avg_square_y += avg_square_y_delta
 
-    image.save("infographic.png")
-    image.show()
+    return image
+
+
+def redraw_infographics(dict, stats, image, today = None):
+    """
+    Restores the template under the stats and draws them again, leaving the calendar untouched. Returns the image.
+    @param dict: A GameStore, or a dictionary of NYT Connections data grouped by month as returned by game_data.group_by_month.
+    @param stats: A StatsAccumulator holding every game in dict.
+    @param image: The PIL image to redraw the stats on.
+    @param today: The date missed days are counted up to, defaults to now.
+    """
+    image.paste(load_template().crop(STATS_BOX), STATS_BOX)
+    return draw_infographics(dict, stats, image, today)
 
 
 def get_aggregate_data(dict):
@@ -77,136 +100,44 @@ def get_aggregate_data(dict):
     Takes an output dictionary containing NYT Connections data and returns aggregate data. Specifically returns the following variables:
     total_games: The total amount of Connections games played.
     longest_streak: The longest amount of wins in a row.
-    streak_start_date, streak_end_date: The start and end date of the longest winning streak.
+    streak_start_date, streak_end_date: The start and end date of the longest winning streak (the earliest one if tied).
     average_attempts: The average number of guesses across all games, wins and losses.
     missed_games: The number of missed games in the current year.
-    @param dict: A dictionary of NYT Connections data in the proper format as returned by XYZ Function.
+    @param dict: A GameStore, or a dictionary of NYT Connections data grouped by month as returned by game_data.group_by_month.
     """
-    # Missed games is total days in current year - number of games played
-    days_passed = datetime.now().timetuple().tm_yday
-    total_games = sum(len(sub_dict) for sub_dict in dict.values())
-
-    # Setup variables for keeping track of win streak, associated dates, and guesses
-    current_streak = 0
-    longest_streak = 0
-    streak_start_date = None
-    streak_end_date = None
-    guess_total = 0
-
-    # First level is just indexes
-    for sub_dict in dict.values():
-        # Second level has actual game data
-        for game_dict in sub_dict.values():
-            result = game_dict.get("Result")
-            date = game_dict.get("Date")
-            guess_total += game_dict.get("Guesses")
-
-            if result == "Won":
-                # If new streak is beginning, set streak start date
-                if current_streak == 0:
-                    streak_start_date = date
-
-                # Update streak and check if current streak is longer than stored max streak
-                current_streak += 1
-                longest_streak = max(longest_streak, current_streak)
-                streak_end_date = date
-
-            else:
-                # Reset streak data
-                current_streak = 0
-                streak_start_date = None
-
-    # Calculate composite data
-    average_attempts = round(guess_total/total_games, 1)
-    missed_games = days_passed-total_games
-    return total_games, longest_streak, streak_start_date, streak_end_date, average_attempts, missed_games
+    return StatsAccumulator.from_data(dict).aggregate_data()
 
 def get_average_positions(dict):
     """
     Returns the average position for each color/difficulty.
-    @param dict: A dictionary of NYT Connections data in the proper format as returned by XYZ Function.
+    @param dict: A GameStore, or a dictionary of NYT Connections data grouped by month as returned by game_data.group_by_month.
     """
-
-    total_guesses = {"Blue": 0, "Yellow": 0, "Green": 0, "Purple": 0}
-    color_counts = {"Blue": 0, "Yellow": 0, "Green": 0, "Purple": 0}
-
-    for sub_dict in dict.values():
-        for game_dict in sub_dict.values():
-            guess_dict = game_dict.get("Data")
-
-            for guess_number, color in guess_dict.items():
-                if color != "Incorrect":
-                    total_guesses[color] += guess_number
-                    color_counts[color] += 1
-
-    average_guesses = {color: round(total_guesses[color] / color_counts[color], 1) if color_counts != 0 else 0 for color in total_guesses}
-    return average_guesses
+    return StatsAccumulator.from_data(dict).average_positions()
 
 def get_color_stats(dict, selected_color):
     """
     Returns the count of relative placements for purple (the most difficult) connections.
-    @param dict: A dictionary of NYT Connections data in the proper format as returned by XYZ Function.
+    @param dict: A GameStore, or a dictionary of NYT Connections data grouped by month as returned by game_data.group_by_month.
     @param color: A color value, either "Blue", "Yellow", "Green", or "Purple", for which to analyze.
     """
-
     colors = ["Yellow", "Green", "Blue", "Purple"]
     if selected_color not in colors:
         print("Please select a valid NYT Connections color, options are Yellow, Green, Blue, and Purple.")
         print("Also check capitalization")
         return
 
-    position_mapping = {1: "First", 2: "Second", 3: "Third"} # Using clarified names instead of index
-    relative_positions = {"First": 0, "Second": 0, "Third": 0, "Last": 0}
-
-    for sub_dict in dict.values():
-        for game_dict in sub_dict.values():
-            guess_dict = game_dict.get("Data")
-            color_position = None
-            colors_found = 0
-
-            for color in guess_dict.values():
-                if color in colors:
-                    colors_found += 1
-                    if color == selected_color:
-                        color_position = colors_found
-                        break
-            
-            if color_position is not None:
-                relative_position = position_mapping.get(color_position, "Last")
-                relative_positions[relative_position] += 1
-
-    return relative_positions
+    return StatsAccumulator.from_data(dict).color_stats(selected_color)
 
 def get_relative_date_stats(dict, selected_color):
     """
     Returns the relative placement of a color per date.
-    @param dict: A dictionary of NYT Connections data in the proper format as returned by XYZ Function.
+    @param dict: A GameStore, or a dictionary of NYT Connections data grouped by month as returned by game_data.group_by_month.
     @param color: A color value, either "Blue", "Yellow", "Green", or "Purple", for which to analyze.
     """
-
     colors = ["Yellow", "Green", "Blue", "Purple"]
     if selected_color not in colors:
         print("Please select a valid NYT Connections color, options are Yellow, Green, Blue, and Purple.")
         print("Also check capitalization")
         return
 
-    date_positions = {}
-
-    for sub_dict in dict.values():
-        for game_dict in sub_dict.values():
-            date = game_dict['Date']
-            guess_dict = game_dict.get("Data")
-            color_position = None
-            colors_found = 0
-
-            for color in guess_dict.values():
-                if color in colors:
-                    colors_found += 1
-                    if color == selected_color:
-                        color_position = colors_found
-                        break
-            
-            if color_position is not None:
-                date_positions[date] = color_position
-
-    return date_positions
\ No newline at end of file
+    return StatsAccumulator.from_data(dict).relative_date_stats(selected_color)
\ No newline at end of file
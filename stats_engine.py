@@ -0,0 +1,219 @@
+from datetime import datetime
+
+from game_data import iter_games
+
+# Colors in NYT Connections difficulty order
+COLORS = ["Yellow", "Green", "Blue", "Purple"]
+# Using clarified names instead of index for relative placements
+POSITION_NAMES = {1: "First", 2: "Second", 3: "Third"}
+
+
+class StatsAccumulator:
+    """
+    Computes every statistic drawn on the infographic in a single pass over the games.
+    Games must be added in date order, add_game updates all statistics in O(1) so a new day never rescans the history.
+    Usage: stats = StatsAccumulator.from_data(data); stats.add_game(new_game); stats.aggregate_data()
+    """
+
+    def __init__(self):
+        self.total_games = 0
+        self.guess_total = 0
+
+        # Win streak tracking
+        self.current_streak = 0
+        self.current_streak_start = None
+        self.longest_streak = 0
+        self.streak_start_date = None
+        self.streak_end_date = None
+
+        # Sum and count of guess numbers per color, for the average position
+        self.position_totals = {color: 0 for color in COLORS}
+        self.position_counts = {color: 0 for color in COLORS}
+
+        # Count of First/Second/Third/Last relative placements per color
+        self.relative_positions = {color: {"First": 0, "Second": 0, "Third": 0, "Last": 0} for color in COLORS}
+
+        # Relative placement per date, per color
+        self.date_positions = {color: {} for color in COLORS}
+
+        # Wins before the first loss and the date of the first game, so accumulators for consecutive periods can be merged
+        self.first_date = None
+        self.leading_streak = 0
+        self.leading_streak_end = None
+
+    @classmethod
+    def from_data(cls, data):
+        """
+        Builds an accumulator from all games in a dataset.
+        @param data: A GameStore, or a dictionary of NYT Connections data grouped by month as returned by game_data.group_by_month.
+        """
+        stats = cls()
+        for game_dict in iter_games(data):
+            stats.add_game(game_dict)
+        return stats
+
+    def add_game(self, game_dict):
+        """
+        Adds a single game to every statistic.
+        @param game_dict: A json object in the format returned by find_rectangles.
+        """
+        result = game_dict.get("Result")
+        date = game_dict.get("Date")
+        guess_dict = game_dict.get("Data")
+
+        if self.total_games == 0:
+            self.first_date = date
+        self.total_games += 1
+        self.guess_total += game_dict.get("Guesses")
+
+        if result == "Won":
+            # Every game so far was won, so the leading streak grows too
+            if self.leading_streak == self.total_games - 1:
+                self.leading_streak += 1
+                self.leading_streak_end = date
+
+            # If new streak is beginning, set streak start date
+            if self.current_streak == 0:
+                self.current_streak_start = date
+
+            # Update streak and check if current streak is longer than stored max streak
+            self.current_streak += 1
+            # The first streak to reach a length keeps the record, so ties don't move the dates
+            if self.current_streak > self.longest_streak:
+                self.longest_streak = self.current_streak
+                self.streak_start_date = self.current_streak_start
+                self.streak_end_date = date
+        else:
+            # Reset streak data
+            self.current_streak = 0
+            self.current_streak_start = None
+
+        # Walk the guesses once, tracking every color's average and relative position at the same time
+        colors_found = 0
+        seen = set()
+        for guess_number, color in guess_dict.items():
+            if color not in self.position_totals:
+                continue
+
+            self.position_totals[color] += guess_number
+            self.position_counts[color] += 1
+
+            colors_found += 1
+            # Only the first correct guess of a color counts for its relative placement
+            if color not in seen:
+                seen.add(color)
+                self.relative_positions[color][POSITION_NAMES.get(colors_found, "Last")] += 1
+                self.date_positions[color][date] = colors_found
+
+    def merge(self, other):
+        """
+        Adds every game of another accumulator in O(1) per color, without revisiting the games. Returns self.
+        The other accumulator must only hold games dated after the ones already in this one, e.g. the next month.
+        @param other: A StatsAccumulator, it is not modified.
+        """
+        if other.total_games == 0:
+            return self
+        if self.total_games == 0:
+            self.first_date = other.first_date
+
+        # The streak running at the end of this period carries on into the other's leading streak,
+        # and streaks are compared in date order so the earliest one keeps the record on ties
+        joined_streak = self.current_streak + other.leading_streak
+        if joined_streak > self.longest_streak:
+            self.longest_streak = joined_streak
+            self.streak_start_date = self.current_streak_start if self.current_streak else other.first_date
+            self.streak_end_date = other.leading_streak_end
+        if other.longest_streak > self.longest_streak:
+            self.longest_streak = other.longest_streak
+            self.streak_start_date = other.streak_start_date
+            self.streak_end_date = other.streak_end_date
+
+        if self.leading_streak == self.total_games and other.leading_streak:
+            self.leading_streak += other.leading_streak
+            self.leading_streak_end = other.leading_streak_end
+
+        if other.current_streak == other.total_games:
+            # Every game in the other period was won, so the current streak just gets longer
+            if self.current_streak == 0:
+                self.current_streak_start = other.first_date
+            self.current_streak += other.current_streak
+        else:
+            self.current_streak = other.current_streak
+            self.current_streak_start = other.current_streak_start
+
+        self.total_games += other.total_games
+        self.guess_total += other.guess_total
+        for color in COLORS:
+            self.position_totals[color] += other.position_totals[color]
+            self.position_counts[color] += other.position_counts[color]
+            for position, count in other.relative_positions[color].items():
+                self.relative_positions[color][position] += count
+            self.date_positions[color].update(other.date_positions[color])
+        return self
+
+    @classmethod
+    def combine(cls, accumulators):
+        """
+        Returns a new accumulator holding the games of several accumulators, given in date order.
+        @param accumulators: An iterable of StatsAccumulator for consecutive periods.
+        """
+        stats = cls()
+        for accumulator in accumulators:
+            stats.merge(accumulator)
+        return stats
+
+    def aggregate_data(self, today = None, first_day = None):
+        """
+        Returns the same values as get_aggregate_data:
+        total_games, longest_streak, streak_start_date, streak_end_date, average_attempts, missed_games
+        @param today: The date used to count missed games in the current year, defaults to now.
+        @param first_day: An optional date to count missed games from instead of January 1st, e.g. the first day of a month view.
+        """
+        today = today or datetime.now()
+        # Missed games is total days in current year (or since first_day) - number of games played
+        if first_day is None:
+            days_passed = today.timetuple().tm_yday
+        else:
+            days_passed = max(0, today.toordinal() - first_day.toordinal() + 1)
+        average_attempts = round(self.guess_total/self.total_games, 1) if self.total_games else 0
+        missed_games = days_passed-self.total_games
+        return self.total_games, self.longest_streak, self.streak_start_date, self.streak_end_date, average_attempts, missed_games
+
+    def average_positions(self):
+        """
+        Returns the same values as get_average_positions, the average guess number for each color.
+        """
+        return {color: round(self.position_totals[color] / self.position_counts[color], 1) if self.position_counts[color] != 0 else 0
+                for color in ["Blue", "Yellow", "Green", "Purple"]}
+
+    def color_stats(self, selected_color):
+        """
+        Returns the same values as get_color_stats, the count of relative placements for a color.
+        @param selected_color: A color value, either "Blue", "Yellow", "Green", or "Purple".
+        """
+        return dict(self.relative_positions[selected_color])
+
+    def relative_date_stats(self, selected_color):
+        """
+        Returns the same values as get_relative_date_stats, the relative placement of a color per date.
+        @param selected_color: A color value, either "Blue", "Yellow", "Green", or "Purple".
+        """
+        return dict(self.date_positions[selected_color])
+
+    def to_json(self, today = None, first_day = None):
+        """
+        Returns every summary statistic as a json-ready dictionary, for the stats command and the server.
+        @param today: The date used to count missed games in the current year, defaults to now.
+        @param first_day: An optional date to count missed games from instead of January 1st.
+        """
+        total_games, longest_streak, streak_start_date, streak_end_date, average_attempts, missed_games = self.aggregate_data(today, first_day)
+        return {
+            "total_games": total_games,
+            "longest_streak": longest_streak,
+            "streak_start_date": streak_start_date,
+            "streak_end_date": streak_end_date,
+            "average_attempts": average_attempts,
+            "missed_games": missed_games,
+            "average_positions": self.average_positions(),
+            "relative_positions": {color: self.color_stats(color) for color in COLORS},
+        }
@@ -0,0 +1,140 @@
+import os
+from datetime import date, timedelta
+
+import cv2
+import numpy as np
+
+# NYT Connections tile colors in RGB, the same reference values the color thresholds were built from
+NYT_COLORS = {
+    "Yellow": (249, 223, 109),
+    "Green": (160, 195, 90),
+    "Blue": (176, 196, 239),
+    "Purple": (186, 129, 197),
+}
+BACKGROUND_COLOR = (248, 248, 248)
+
+
+def random_game(rng, game_date, mistake_rate = 0.15):
+    """
+    Plays a random game and returns (rows, truth): the tile colors of every guess row and the json object find_rectangles should return.
+    @param rng: A numpy Generator.
+    @param game_date: The date of the game.
+    @param mistake_rate: The chance of each guess being a mistake, defaults to 0.15.
+    """
+    remaining = [str(color) for color in rng.permutation(list(NYT_COLORS))]
+    rows = []
+    mistakes = 0
+
+    while remaining and mistakes < 4:
+        # A mistake needs at least two groups left to mix
+        if len(remaining) > 1 and rng.random() < mistake_rate:
+            # One-away style guess: three tiles from one group and one from another
+            main, other = rng.choice(len(remaining), size=2, replace=False)
+            row = [remaining[main]] * 3 + [remaining[other]]
+            rows.append([str(color) for color in rng.permutation(row)])
+            mistakes += 1
+        else:
+            rows.append([remaining.pop(0)] * 4)
+
+    guess_data = {}
+    for index, row in enumerate(rows, start=1):
+        guess_data[index] = row[0] if len(set(row)) == 1 else 'Incorrect'
+
+    truth = {
+        'Date': game_date.isoformat(),
+        'Result': "Won" if not remaining else "Lost",
+        'Guesses': len(rows),
+        'Data': guess_data
+    }
+    return rows, truth
+
+
+def render_game(rows, tile_size = 32, row_gap = 4, margin = 30):
+    """
+    Draws a result grid like the one in a shared NYT Connections screenshot and returns it as a BGR image.
+    Tiles in a row touch, rows are separated by a small gap.
+    @param rows: A list of guess rows, each a list of 4 color names.
+    @param tile_size: Width and height of each tile in pixels, defaults to 32.
+    @param row_gap: Pixels between rows, defaults to 4.
+    @param margin: Pixels of background around the grid, defaults to 30.
+    """
+    width = 2 * margin + 4 * tile_size
+    height = 2 * margin + len(rows) * tile_size + max(0, len(rows) - 1) * row_gap
+    image = np.full((height, width, 3), BACKGROUND_COLOR[::-1], dtype=np.uint8)
+
+    # Blend each tile into the background through its rounded-corner mask
+    alpha = tile_mask(tile_size)[:, :, None]
+    background = np.array(BACKGROUND_COLOR[::-1], dtype=np.float32)
+    for row_index, row in enumerate(rows):
+        top = margin + row_index * (tile_size + row_gap)
+        for tile_index, color in enumerate(row):
+            left = margin + tile_index * tile_size
+            tile = alpha * np.array(NYT_COLORS[color][::-1], dtype=np.float32) + (1 - alpha) * background
+            image[top:top + tile_size, left:left + tile_size] = np.round(tile).astype(np.uint8)
+
+    return image
+
+
+def tile_mask(tile_size, supersample = 4):
+    """
+    Returns an anti-aliased rounded-square coverage mask (0-1 floats), the tiles in real screenshots have slightly rounded corners.
+    @param tile_size: Width and height of the tile in pixels.
+    @param supersample: Drawing resolution multiplier used for anti-aliasing, defaults to 4.
+    """
+    size = tile_size * supersample
+    radius = max(1, tile_size // 12) * supersample
+    mask = np.zeros((size, size), dtype=np.uint8)
+    cv2.rectangle(mask, (radius, 0), (size - 1 - radius, size - 1), 255, -1)
+    cv2.rectangle(mask, (0, radius), (size - 1, size - 1 - radius), 255, -1)
+    for cx in (radius, size - 1 - radius):
+        for cy in (radius, size - 1 - radius):
+            cv2.circle(mask, (cx, cy), radius, 255, -1)
+    return cv2.resize(mask, (tile_size, tile_size), interpolation=cv2.INTER_AREA).astype(np.float32) / 255
+
+
+def random_layout(rng):
+    """
+    Returns random render_game arguments so screenshots come in varied resolutions.
+    """
+    tile_size = int(rng.integers(28, 45))
+    return {"tile_size": tile_size, "row_gap": max(3, tile_size // 8), "margin": int(rng.integers(20, 60))}
+
+
+def generate_games(n_games, start_date = date(2024, 1, 1), seed = 0, skip_rate = 0.02, mistake_rate = 0.15):
+    """
+    Returns a list of (rows, truth) pairs for n_games daily games, skipping the odd day like a real history.
+    @param n_games: Number of games to generate.
+    @param start_date: Date of the first game, defaults to 2024-01-01.
+    @param seed: Random seed, the same seed always produces the same games.
+    @param skip_rate: Chance of missing a day before each game, defaults to 0.02.
+    @param mistake_rate: The chance of each guess being a mistake, defaults to 0.15.
+    """
+    rng = np.random.default_rng(seed)
+    games = []
+    game_date = start_date
+    for _ in range(n_games):
+        while rng.random() < skip_rate:
+            game_date += timedelta(days=1)
+        games.append(random_game(rng, game_date, mistake_rate))
+        game_date += timedelta(days=1)
+    return games
+
+
+def write_screenshots(folder_path, games, seed = 0):
+    """
+    Renders every game into folder_path with a date-stamped filename like a real screenshot.
+    Returns a list of (path, truth) pairs in filename order.
+    @param folder_path: The folder to write to, created if needed.
+    @param games: A list of (rows, truth) pairs as returned by generate_games.
+    @param seed: Random seed for the layouts and timestamps.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(folder_path, exist_ok=True)
+
+    written = []
+    for rows, truth in games:
+        timestamp = "{:02d}{:02d}{:02d}".format(int(rng.integers(6, 24)), int(rng.integers(0, 60)), int(rng.integers(0, 60)))
+        image_path = os.path.join(folder_path, "Screenshot {} {}.png".format(truth['Date'], timestamp))
+        cv2.imwrite(image_path, render_game(rows, **random_layout(rng)))
+        written.append((image_path, truth))
+    return written
@@ -0,0 +1,205 @@
+import json
+import os
+import time
+from collections import deque
+from itertools import chain, zip_longest
+
+from dedupe import HashIndex, DEFAULT_HASH_INDEX_PATH, DuplicateFilter
+from game_store import GameStore
+from ingest import analyze_in_order, archive_members, list_archives, scan_screenshots, unique_members, unique_screenshots
+from render import draw_infographic_image, encode_image
+from result_cache import ResultCache, DEFAULT_CACHE_PATH
+
+DEFAULT_OUTPUT_DIR = "infographics"
+
+
+def user_folders(root):
+    """
+    Returns a sorted list of (user name, folder path) for every sub-folder of root, one folder of screenshots per user.
+    @param root: The directory holding the user folders.
+    """
+    with os.scandir(root) as entries:
+        return sorted((entry.name, entry.path) for entry in entries if entry.is_dir())
+
+
+def interleave(queues):
+    """
+    Yields items from several iterables round-robin (first of each, then second of each...), so no iterable waits behind a longer one.
+    Iterables are pulled lazily, one item at a time.
+    @param queues: A list of iterables.
+    """
+    for items in zip_longest(*queues):
+        for item in items:
+            if item is not None:
+                yield item
+
+
+class TeamUser:
+    """
+    The screenshots, results and timing report of one user in a team batch.
+    """
+
+    def __init__(self, name, folder_path, output, hash_index = None):
+        self.name = name
+        self.folder_path = folder_path
+        # Each user's screenshots are only compared with their own
+        self.duplicates = DuplicateFilter(hash_index) if hash_index else None
+        self.results = []
+        # Screenshots listed but not analyzed yet, and whether the listing has reached the end of the folder
+        self.pending = 0
+        self.listed = False
+        self.rendered = False
+        self.report = {
+            "screenshots": 0, "duplicates": 0, "cached": 0, "analyzed": 0, "failures": [],
+            "analysis_seconds": 0.0, "render_seconds": None, "output": output,
+        }
+
+    def items(self):
+        """
+        Yields (owner, image_path, read) for the user's archive members and then their screenshots, the same order as analyze_folder.
+        Archives are read lazily, so they are only opened once the shared pipeline gets to them.
+        """
+        members = (member for archive_path in list_archives(self.folder_path) for member in archive_members(archive_path))
+        screenshots = scan_screenshots(self.folder_path)
+        if self.duplicates is not None:
+            # The same duplicate filter as iter_archive_results and iter_results, applied before anything is queued
+            members = unique_members(members, self.duplicates)
+            screenshots = unique_screenshots(screenshots, self.duplicates)
+        for image_path, read in chain(members, ((image_path, None) for _, image_path in screenshots)):
+            self.pending += 1
+            self.report["screenshots"] += 1
+            yield self, image_path, read
+
+        self.listed = True
+        if self.duplicates is not None:
+            self.report["duplicates"] = sum(len(paths) for paths in self.duplicates.collapsed.values())
+            self.report["screenshots"] += self.report["duplicates"]
+
+    def add(self, outcome):
+        image_path, data, error, seconds = outcome
+        self.pending -= 1
+        if seconds is not None:
+            self.report["analysis_seconds"] += seconds
+        if error is not None:
+            self.report["failures"].append({"stage": "analyze", "path": image_path, "error": error})
+        else:
+            self.results.append(data)
+            self.report["cached" if seconds is None else "analyzed"] += 1
+
+    @property
+    def done(self):
+        return self.listed and self.pending == 0 and not self.rendered
+
+    def render(self):
+        # The template and fonts are cached per process, so only the first user pays for loading them
+        self.rendered = True
+        start = time.perf_counter()
+        # Stable sort, so games keep their archive and filename order within a date
+        ordered = sorted(self.results, key=lambda game: game['Date'])
+        try:
+            image = draw_infographic_image(GameStore.from_results(ordered))
+            encode_image(image, self.report["output"])
+        except Exception as e:
+            # One user's broken render must not cost every other user their infographic
+            self.report["failures"].append({"stage": "render", "path": self.report["output"], "error": "{}: {}".format(type(e).__name__, e)})
+            self.report["output"] = None
+            return
+        self.report["render_seconds"] = round(time.perf_counter() - start, 4)
+
+
+def run_team(root, output_dir = DEFAULT_OUTPUT_DIR, cache_path = DEFAULT_CACHE_PATH, workers = None, max_pending = None, hash_index_path = DEFAULT_HASH_INDEX_PATH):
+    """
+    Analyzes every user's screenshots and archives on one shared worker pool and writes one infographic per user, plus summary.json.
+    Users are interleaved round-robin so everyone progresses together, and each user is rendered as soon as their last screenshot is done.
+    Returns the summary dictionary.
+    @param root: The directory holding one screenshot folder per user. Zip and tar archives in a user's folder are read in place.
+    @param output_dir: The folder the infographics are written to, as <user>.png.
+    @param cache_path: The result cache file shared by all users, pass None to disable it.
+    @param workers: Number of worker processes, defaults to the CPU count. 1 runs serially in the current process.
+    @param max_pending: Bound on the shared analysis queue, defaults to 4 per worker.
+    @param hash_index_path: The perceptual hash index file shared by all users, pass None to analyze duplicate screenshots too.
+    """
+    start = time.perf_counter()
+    cache = ResultCache(cache_path) if cache_path else None
+    os.makedirs(output_dir, exist_ok=True)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+
+    hash_index = HashIndex(hash_index_path) if hash_index_path else None
+    users = {name: TeamUser(name, folder_path, os.path.join(output_dir, name + ".png"), hash_index) for name, folder_path in user_folders(root)}
+
+    # Outcomes come back in the order items went in, so the owners queue lines up with them
+    owners = deque()
+
+    def items():
+        for user, image_path, read in interleave([user.items() for user in users.values()]):
+            owners.append(user)
+            yield image_path, read
+
+    # Cache hits come straight back, misses run on the pool, and users render while the pool keeps analyzing the others
+    for outcome in analyze_in_order(items(), cache, workers, max_pending, timed=True):
+        owners.popleft().add(outcome)
+        for user in users.values():
+            if user.done:
+                user.render()
+
+    # Users without any screenshots, or whose listing only finished after their last result
+    for user in users.values():
+        if not user.rendered:
+            user.render()
+
+    if cache:
+        cache.save()
+    if hash_index is not None and hash_index.computed:
+        hash_index.save()
+
+    summary = summarize(users, time.perf_counter() - start, workers)
+    with open(os.path.join(output_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def summarize(users, wall_seconds, workers):
+    """
+    Returns the per-user reports and the batch totals as a json-ready dictionary.
+    """
+    reports = {}
+    for name, user in users.items():
+        report = dict(user.report)
+        report["analysis_seconds"] = round(report["analysis_seconds"], 4)
+        reports[name] = report
+
+    analyzed = sum(report["analyzed"] for report in reports.values())
+    return {
+        "users": reports,
+        "total": {
+            "users": len(reports),
+            "workers": workers,
+            "screenshots": sum(report["screenshots"] for report in reports.values()),
+            "duplicates": sum(report["duplicates"] for report in reports.values()),
+            "cached": sum(report["cached"] for report in reports.values()),
+            "analyzed": analyzed,
+            "failures": sum(len(report["failures"]) for report in reports.values()),
+            "analysis_seconds": round(sum(report["analysis_seconds"] for report in reports.values()), 4),
+            "render_seconds": round(sum(report["render_seconds"] or 0 for report in reports.values()), 4),
+            "wall_seconds": round(wall_seconds, 4),
+            "analyzed_per_second": round(analyzed / wall_seconds, 1) if wall_seconds else None,
+        },
+    }
+
+
+def print_summary(summary):
+    print("{:<20} {:>11} {:>10} {:>7} {:>9} {:>9} {:>11} {:>9}".format("user", "screenshots", "duplicates", "cached", "analyzed", "failures", "analysis s", "render s"))
+    for name, report in summary["users"].items():
+        print("{:<20} {:>11} {:>10} {:>7} {:>9} {:>9} {:>11} {!s:>9}".format(
+            name, report["screenshots"], report["duplicates"], report["cached"], report["analyzed"], len(report["failures"]),
+            report["analysis_seconds"], report["render_seconds"]))
+        for failure in report["failures"]:
+            print("    Failed to", failure["stage"], failure["path"], "-", failure["error"])
+
+    total = summary["total"]
+    print("{users} users, {screenshots} screenshots ({duplicates} duplicates, {cached} cached, {analyzed} analyzed, {failures} failed) "
+          "in {wall_seconds} s on {workers} worker(s), {analyzed_per_second} analyzed/s".format(**total))
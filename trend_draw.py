@@ -0,0 +1,144 @@
+import math
+from datetime import date
+
+from PIL import Image, ImageDraw
+
+from assets import get_font
+from trends import Trends
+
+# The trend panel is appended below the template, which keeps the rest of the infographic untouched
+TREND_PANEL_HEIGHT = 720
+TREND_WINDOW = 30
+BACKGROUND_COLOR = (0, 0, 0)
+TEXT_COLOR = (202, 202, 202)
+GRID_COLOR = (70, 70, 70)
+# Same named colors stats_draw uses for the color squares
+LINE_COLORS = {"yellow_position": "Yellow", "green_position": "Green", "blue_position": "Blue", "purple_position": "Purple"}
+WIN_RATE_COLOR = (202, 202, 202)
+
+# Chart areas inside the panel as (left, top, right, bottom)
+POSITION_CHART = (70, 170, 970, 370)
+WIN_RATE_CHART = (70, 440, 970, 540)
+TABLE_TOP = 590
+
+
+def draw_trend_panel(image, data = None, trends = None, window = TREND_WINDOW):
+    """
+    Returns a taller copy of the image with a trend panel below it: rolling solve positions per color, the rolling
+    win rate, and a table of the 7/30/90-day averages.
+    @param image: The finished infographic as a PIL image.
+    @param data: A GameStore, or a dictionary of NYT Connections data grouped by month as returned by game_data.group_by_month.
+    @param trends: An optional Trends already built from data.
+    @param window: The window plotted in the charts, defaults to 30 days.
+    """
+    if trends is None:
+        trends = Trends.from_data(data)
+
+    panel = Image.new(image.mode, (image.width, image.height + TREND_PANEL_HEIGHT), BACKGROUND_COLOR)
+    panel.paste(image, (0, 0))
+    draw = ImageDraw.Draw(panel)
+    top = image.height
+
+    title_font = get_font("Roboto-Bold.ttf", 110)
+    bbox = title_font.getbbox("TRENDS")
+    draw.text(((image.width - bbox[2] - bbox[0]) / 2, top + 10 - bbox[1]), "TRENDS", fill=TEXT_COLOR, font=title_font)
+
+    font = get_font("Roboto-Regular.ttf", 22)
+    position_chart = offset_box(POSITION_CHART, top)
+    win_rate_chart = offset_box(WIN_RATE_CHART, top)
+
+    draw.text((position_chart[0], position_chart[1] - 35), "Solve position, {}-day average (1 = solved first)".format(window), fill=TEXT_COLOR, font=font)
+    draw_axes(draw, trends, position_chart, [(1, "1"), (2, "2"), (3, "3"), (4, "4")], 1, 4, font)
+    for name, color in LINE_COLORS.items():
+        draw_series(draw, trends.rolling[window][name], position_chart, 1, 4, color)
+
+    draw.text((win_rate_chart[0], win_rate_chart[1] - 35), "Win rate, {}-day average".format(window), fill=TEXT_COLOR, font=font)
+    # Win rate is drawn with 100% at the top
+    draw_axes(draw, trends, win_rate_chart, [(1, "100%"), (0.5, "50%"), (0, "0%")], 1, 0, font)
+    draw_series(draw, trends.rolling[window]["won"], win_rate_chart, 1, 0, WIN_RATE_COLOR)
+
+    draw_table(draw, trends, top + TABLE_TOP, font)
+    return panel
+
+
+def offset_box(box, top):
+    return box[0], box[1] + top, box[2], box[3] + top
+
+
+def value_y(value, box, top_value, bottom_value):
+    # Linear map from the value range onto the chart height, top_value sits on the top edge
+    return box[1] + (value - top_value) / (bottom_value - top_value) * (box[3] - box[1])
+
+
+def day_x(index, day_count, box):
+    return box[0] + index * (box[2] - box[0]) / max(day_count - 1, 1)
+
+
+def draw_axes(draw, trends, box, y_ticks, top_value, bottom_value, font):
+    """
+    Draws horizontal grid lines with labels, and month or year ticks along the bottom edge.
+    """
+    for value, text in y_ticks:
+        y = value_y(value, box, top_value, bottom_value)
+        draw.line([(box[0], y), (box[2], y)], fill=GRID_COLOR, width=1)
+        draw.text((box[0] - 10 - font.getlength(text), y - 13), text, fill=TEXT_COLOR, font=font)
+
+    if len(trends.days) == 0:
+        return
+
+    first_day = date.fromordinal(int(trends.days[0]))
+    last_day = date.fromordinal(int(trends.days[-1]))
+    # Month ticks for short histories, only January (labeled with the year) once there are more than a year of months
+    yearly = (last_day.year - first_day.year) * 12 + last_day.month - first_day.month > 12
+    year, month = first_day.year, first_day.month
+    while (year, month) <= (last_day.year, last_day.month):
+        tick = date(year, month, 1)
+        if tick >= first_day and (not yearly or month == 1):
+            x = day_x(tick.toordinal() - first_day.toordinal(), len(trends.days), box)
+            draw.line([(x, box[3]), (x, box[3] + 6)], fill=TEXT_COLOR, width=1)
+            label = str(year) if yearly else tick.strftime("%b")
+            draw.text((x + 3, box[3] + 4), label, fill=TEXT_COLOR, font=get_font("Roboto-Regular.ttf", 16))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def draw_series(draw, values, box, top_value, bottom_value, color):
+    """
+    Draws one rolling series as a line, with gaps where the window had no games.
+    """
+    segment = []
+    for index, value in enumerate(values.tolist()):
+        if math.isnan(value):
+            draw_segment(draw, segment, color)
+            segment = []
+            continue
+        segment.append((day_x(index, len(values), box), value_y(value, box, top_value, bottom_value)))
+    draw_segment(draw, segment, color)
+
+
+def draw_segment(draw, points, color):
+    if len(points) > 1:
+        draw.line(points, fill=color, width=3, joint="curve")
+    elif points:
+        x, y = points[0]
+        draw.ellipse([x - 2, y - 2, x + 2, y + 2], fill=color)
+
+
+def draw_table(draw, trends, top, font):
+    """
+    Draws the latest averages for the first three windows (7/30/90 days by default) for the win rate, mistakes, and the purple solve position.
+    """
+    rows = [
+        ("Win rate", "won", lambda value: "{:.0%}".format(value)),
+        ("Mistakes per game", "mistakes", lambda value: "{:.2f}".format(value)),
+        ("Purple position", "purple_position", lambda value: "{:.2f}".format(value)),
+    ]
+    columns_x = [430, 620, 810]
+    for x, window in zip(columns_x, trends.windows):
+        draw.text((x, top), "{} days".format(window), fill=TEXT_COLOR, font=font)
+
+    for row_index, (label, name, formatter) in enumerate(rows, start=1):
+        y = top + row_index * 32
+        draw.text((70, y), label, fill=TEXT_COLOR, font=font)
+        for x, window in zip(columns_x, trends.windows):
+            value = trends.latest(window)[name]
+            draw.text((x, y), "-" if math.isnan(value) else formatter(value), fill=TEXT_COLOR, font=font)
@@ -0,0 +1,117 @@
+import numpy as np
+
+from game_store import GameStore, COLOR_CODES, MISSING_DATE
+from stats_engine import COLORS
+
+# Rolling window lengths in calendar days
+WINDOWS = (7, 30, 90)
+# Per-game features, in column order
+FEATURES = ["won", "mistakes", "streak"] + [color.lower() + "_position" for color in COLORS]
+
+
+def streak_history(won):
+    """
+    Returns the win streak after every game, e.g. [W, W, L, W] -> [1, 2, 0, 1], without a Python loop.
+    @param won: A boolean array, one entry per game in date order.
+    """
+    number = np.arange(1, len(won) + 1)
+    # Running index of the most recent loss, the streak is the distance to it
+    last_loss = np.maximum.accumulate(np.where(won, 0, number)) if len(won) else number
+    return number - last_loss
+
+
+def game_features(store):
+    """
+    Returns (dates, features): the date ordinals of every dated game and a (games x FEATURES) float array.
+    Positions are the relative solve position (1 = first color solved) and NaN when the color wasn't solved,
+    counted the same way as get_relative_date_stats.
+    @param store: A GameStore.
+    """
+    records = store.records[store.dates != MISSING_DATE]
+    colors = records["colors"]
+    won = records["won"]
+
+    # Every correct guess moves the relative position on by one
+    correct = (colors >= COLOR_CODES["Yellow"]) & (colors <= COLOR_CODES["Purple"])
+    solved_count = np.cumsum(correct, axis=1)
+
+    features = np.empty((len(records), len(FEATURES)))
+    features[:, 0] = won
+    features[:, 1] = (colors == COLOR_CODES["Incorrect"]).sum(axis=1)
+    features[:, 2] = streak_history(won)
+    rows = np.arange(len(records))
+    for column, color in enumerate(COLORS, start=3):
+        hit = colors == COLOR_CODES[color]
+        # argmax finds the first guess of the color, rows without one get NaN
+        first = hit.argmax(axis=1)
+        features[:, column] = np.where(hit.any(axis=1), solved_count[rows, first], np.nan)
+
+    return records["date"].astype(np.int64), features
+
+
+class Trends:
+    """
+    Rolling averages of every game feature over calendar-day windows, on a daily grid from the first to the last game.
+    Everything is computed from cumulative sums, so all windows and features take one O(games + days) pass.
+    Usage: trends = Trends.from_data(store); trends.rolling[30]["purple_position"]; trends.latest(7)
+    """
+
+    def __init__(self, dates, features, windows = WINDOWS):
+        """
+        @param dates: Date ordinals of each game, sorted.
+        @param features: A (games x FEATURES) float array, NaN where a feature doesn't apply to a game.
+        @param windows: Window lengths in days, defaults to 7, 30 and 90.
+        """
+        self.dates = dates
+        self.features = features
+        self.windows = tuple(windows)
+        self.rolling = {window: {} for window in self.windows}
+
+        if len(dates) == 0:
+            self.days = np.zeros(0, dtype=np.int64)
+            return
+
+        day_index = dates - dates[0]
+        day_count = int(day_index[-1]) + 1
+        self.days = dates[0] + np.arange(day_count)
+
+        # Cumulative sums over games, a leading zero row makes every range a single subtraction
+        valid = ~np.isnan(features)
+        value_sums = np.vstack([np.zeros((1, features.shape[1])), np.cumsum(np.where(valid, features, 0), axis=0)])
+        value_counts = np.vstack([np.zeros((1, features.shape[1])), np.cumsum(valid, axis=0)])
+        # Number of games played on or before each day
+        games_by_day = np.cumsum(np.bincount(day_index, minlength=day_count))
+
+        for window in self.windows:
+            # Games before the window starts: the count from window days earlier, zero near the beginning
+            games_before = np.concatenate([np.zeros(min(window, day_count), dtype=np.int64), games_by_day[:-window]])
+            sums = value_sums[games_by_day] - value_sums[games_before]
+            counts = value_counts[games_by_day] - value_counts[games_before]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means = np.where(counts > 0, sums / counts, np.nan)
+            for column, name in enumerate(FEATURES):
+                self.rolling[window][name] = means[:, column]
+
+    @classmethod
+    def from_data(cls, data, windows = WINDOWS):
+        """
+        Builds the trends for all games in a dataset.
+        @param data: A GameStore, or a dictionary of NYT Connections data grouped by month as returned by game_data.group_by_month.
+        @param windows: Window lengths in days, defaults to 7, 30 and 90.
+        """
+        store = data if isinstance(data, GameStore) else GameStore.from_monthly_dict(data)
+        dates, features = game_features(store)
+        return cls(dates, features, windows)
+
+    def per_game(self, name):
+        """
+        Returns one feature for every game in date order, e.g. per_game("streak") for the streak history.
+        """
+        return self.features[:, FEATURES.index(name)]
+
+    def latest(self, window):
+        """
+        Returns {feature: value} for the window ending on the last game day, NaN where the window has no data.
+        @param window: One of the window lengths.
+        """
+        return {name: float(values[-1]) if len(values) else float("nan") for name, values in self.rolling[window].items()}
@@ -0,0 +1,211 @@
+import os
+import time
+from datetime import date
+
+from PIL import ImageDraw
+
+from assets import new_canvas
+from calendar_draw import draw_calendar, draw_day, clear_day
+from calendar_layout import CalendarLayout
+from dedupe import HashIndex, DEFAULT_HASH_INDEX_PATH, DuplicateFilter, print_collapsed
+from game_data import ARCHIVE_SEPARATOR
+from game_store import GameStore, MISSING_DATE
+from ingest import iter_results, iter_archive_results, is_archive, list_archives, scan_screenshots, screenshot_date, unique_screenshots
+from instrumentation import span
+from render import encode_image
+from result_cache import ResultCache, DEFAULT_CACHE_PATH
+from stats_draw import draw_infographics, redraw_infographics
+from stats_engine import StatsAccumulator
+
+
+def scan_folder(folder_path):
+    """
+    Returns a {path: (size, mtime)} snapshot of the files in a folder, using only the directory entries (no file reads).
+    @param folder_path: The folder holding the screenshots and archives, or a single archive.
+    """
+    if os.path.isfile(folder_path):
+        stat = os.stat(folder_path)
+        return {folder_path: (stat.st_size, stat.st_mtime_ns)}
+
+    snapshot = {}
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if entry.is_file():
+                stat = entry.stat()
+                snapshot[entry.path] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+def parse_game_date(game):
+    """
+    Returns the date of a game, or None for screenshots without a date in the filename.
+    """
+    try:
+        return date.fromisoformat(game['Date'])
+    except ValueError:
+        return None
+
+
+class InfographicWatcher:
+    """
+    Keeps an infographic up to date with a screenshot folder.
+    Each poll only analyzes new or changed screenshots (and re-reads changed archives), updates the stats incrementally when possible,
+    and redraws just the affected calendar squares and the stats area on the in-memory image.
+    Usage: watcher = InfographicWatcher("NYT_Connections"); watcher.run()
+    """
+
+    def __init__(self, folder_path = "NYT_Connections", output = "infographic.png", cache_path = DEFAULT_CACHE_PATH, hash_index_path = DEFAULT_HASH_INDEX_PATH):
+        self.folder_path = folder_path
+        self.output = output
+        self.cache = ResultCache(cache_path) if cache_path else None
+        self.hash_index = HashIndex(hash_index_path) if hash_index_path else None
+
+        self.snapshot = {}
+        # Analysis result per screenshot path, and the screenshots skipped as duplicates by the last poll
+        self.results = {}
+        self.skipped = set()
+        self.store = GameStore()
+        self.stats = StatsAccumulator()
+        self.layout = None
+        self.image = None
+
+    def poll(self):
+        """
+        Checks the folder once and brings the infographic up to date. Returns the list of paths that were (re)analyzed.
+        """
+        snapshot = scan_folder(self.folder_path)
+        changed = sorted(path for path, signature in snapshot.items() if self.snapshot.get(path) != signature)
+        removed = [path for path in self.snapshot if path not in snapshot]
+        self.snapshot = snapshot
+
+        if not changed and not removed and self.image is not None:
+            return []
+
+        previous_last = self.last_date
+
+        stale = set(changed) | set(removed)
+        duplicates = DuplicateFilter(self.hash_index) if self.hash_index else None
+        # Which members are duplicates depends on every archive before them, so any archive change re-reads them all (cache hits are cheap)
+        reread = self.image is None or any(is_archive(path) for path in stale)
+
+        # Dates whose squares need to be redrawn, old results first so a changed screenshot also clears its previous date
+        dirty_dates = set()
+        replaced = False
+        added = []
+
+        def drop(path):
+            nonlocal replaced
+            dirty_dates.add(parse_game_date(self.results.pop(path)))
+            replaced = True
+
+        def record(outcomes):
+            for path, data, error in outcomes:
+                if error is not None:
+                    print("Failed to analyze", path, "-", error)
+                    continue
+                self.results[path] = data
+                dirty_dates.add(parse_game_date(data))
+                added.append(data)
+
+        for path in [path for path in self.results if path in stale or (reread and ARCHIVE_SEPARATOR in path)]:
+            drop(path)
+
+        # The same ingest path and order as create_infographic: archives first, then the screenshots by date
+        if reread:
+            record(iter_archive_results(list_archives(self.folder_path), self.cache, duplicates=duplicates))
+        elif duplicates is not None:
+            # Unchanged archives keep their members, the filter just needs to know about them
+            for path in [path for path in self.results if ARCHIVE_SEPARATOR in path]:
+                duplicates.check(screenshot_date(path), path)
+
+        kept = scan_screenshots(self.folder_path)
+        if duplicates is not None:
+            kept = list(unique_screenshots(kept, duplicates))
+        kept_paths = {path for _, path in kept}
+
+        # Screenshots that became duplicates are dropped, ones that stopped being duplicates are analyzed again
+        for path in [path for path in self.results if ARCHIVE_SEPARATOR not in path and path not in kept_paths]:
+            drop(path)
+        record(iter_results([(game_date, path) for game_date, path in kept if path in stale or path in self.skipped], self.cache))
+
+        if duplicates is not None:
+            # Only list duplicates that weren't already skipped by an earlier poll
+            new = {original: [path for path in paths if path not in self.skipped] for original, paths in duplicates.collapsed.items()}
+            print_collapsed({original: paths for original, paths in new.items() if paths})
+            self.skipped = {path for paths in duplicates.collapsed.values() for path in paths}
+            if self.hash_index.computed:
+                self.hash_index.save()
+
+        if self.cache:
+            self.cache.save()
+
+        # Same order as analyze_folder: by date, archive members before screenshots, then by name
+        ordered = [self.results[path] for path in sorted(
+            self.results, key=lambda path: (self.results[path]['Date'], ARCHIVE_SEPARATOR not in path, os.path.basename(path), path))]
+        self.store = GameStore.from_results(ordered)
+
+        # Only games added after the newest known date can be appended, anything else rebuilds the stats (still one pass)
+        appendable = not replaced and all(
+            parse_game_date(game) is not None and (previous_last is None or parse_game_date(game) > previous_last) for game in added)
+        if appendable:
+            for game in sorted(added, key=lambda game: game['Date']):
+                self.stats.add_game(game)
+        else:
+            self.stats = StatsAccumulator.from_data(self.store)
+
+        layout = self.default_layout()
+        if self.image is None or layout.first_month != self.layout.first_month:
+            # First run, or the newest game moved into a new year, draw everything
+            self.layout = layout
+            self.image = new_canvas()
+            draw_calendar(self.store, self.image, self.layout)
+            draw_infographics(self.store, self.stats, self.image)
+        else:
+            with span("redraw_days"):
+                self.redraw_days(dirty_dates)
+            with span("redraw_infographics"):
+                redraw_infographics(self.store, self.stats, self.image)
+
+        encode_image(self.image, self.output)
+        return changed
+
+    @property
+    def last_date(self):
+        # The store is sorted by date with undated games last
+        dated = self.store.dates[self.store.dates != MISSING_DATE]
+        return date.fromordinal(int(dated[-1])) if len(dated) else None
+
+    def default_layout(self):
+        last_date = self.last_date
+        return CalendarLayout.for_year(last_date.year if last_date else date.today().year)
+
+    def redraw_days(self, dirty_dates):
+        """
+        Clears the squares for the given dates and redraws whichever games remain on them.
+        """
+        draw = ImageDraw.Draw(self.image)
+        for day in dirty_dates:
+            if day is None:
+                continue
+            clear_day(self.image, self.layout, day)
+            row = self.store.index_of(day.isoformat())
+            # Draw every game on that date in order, the last one ends up on top like a full render
+            while row is not None and row < len(self.store) and self.store.dates[row] == day.toordinal():
+                draw_day(draw, self.layout, day, self.store.game(row))
+                row += 1
+
+    def run(self, poll_interval = 1.0):
+        """
+        Polls the folder forever, re-rendering whenever screenshots are added, changed, or removed.
+        @param poll_interval: Seconds between polls, defaults to 1.
+        """
+        while True:
+            start = time.perf_counter()
+            changed = self.poll()
+            if changed:
+                print("Updated", self.output, "with", len(changed), "screenshot(s) in", round(time.perf_counter() - start, 3), "seconds")
+            time.sleep(poll_interval)
+
+
+def watch(folder_path = "NYT_Connections", output = "infographic.png", cache_path = DEFAULT_CACHE_PATH, poll_interval = 1.0, hash_index_path = DEFAULT_HASH_INDEX_PATH):
+    InfographicWatcher(folder_path, output, cache_path, hash_index_path).run(poll_interval)